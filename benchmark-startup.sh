@@ -0,0 +1,73 @@
+#!/bin/bash
+
+# Times how long `gh migrate` and each of its commands take to start.  Fails
+# if `gh migrate --help` imports a heavy dependency, or if anything is slower
+# than its budget (in milliseconds).
+#
+# Usage: bash benchmark-startup.sh [help-budget-ms] [command-budget-ms] [runs]
+
+help_budget="${1:-500}"
+command_budget="${2:-1500}"
+runs="${3:-5}"
+
+commands=(
+    "--help"
+    "start --help"
+    "report --help"
+    "stats --help"
+    "load --help"
+    "scripts --help"
+    "get --help"
+    "snapshots --help"
+    "manns --help"
+    "predict --help"
+    "plan --help"
+    "execute --help"
+    "status --help"
+    "apply --help"
+    "archive --help"
+    "reclaim --help"
+    "store --help"
+)
+
+# Nothing but click is needed to list the commands
+heavy="pandas|numpy|openpyxl|githubkit|httpx|jinja2|git"
+
+failed=0
+
+if python -X importtime -m migrate --help 2>&1 >/dev/null |
+    grep -Eq "\| +($heavy)$"; then
+    echo "FAIL: 'gh migrate --help' imports one of: $heavy"
+    failed=1
+fi
+
+for command in "${commands[@]}"; do
+    best=""
+
+    for _ in $(seq "$runs"); do
+        start=$(date +%s%N)
+        python -m migrate $command >/dev/null 2>&1
+        end=$(date +%s%N)
+
+        elapsed=$(((end - start) / 1000000))
+        if [ -z "$best" ] || [ "$elapsed" -lt "$best" ]; then
+            best=$elapsed
+        fi
+    done
+
+    budget=$command_budget
+    if [ "$command" = "--help" ]; then
+        budget=$help_budget
+    fi
+
+    if [ "$best" -gt "$budget" ]; then
+        status="FAIL"
+        failed=1
+    else
+        status="ok"
+    fi
+
+    printf "%-20s %6d ms  %s\n" "$command" "$best" "$status"
+done
+
+exit $failed
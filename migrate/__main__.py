@@ -1,21 +1,90 @@
 import os
 import sys
 import click
-from .commands.start import start
-from .commands.report import report
-from .commands.stats import stats
-from .commands.load import load
-from .commands.scripts import scripts
-from .commands.get import get
-from .commands.snapshots import snapshots
-from .commands.manns import manns
-
+import importlib
 from loguru import logger
 
+from migrate.profiling import start_profiling, stop_profiling
+
+
+# Each command's module, and its help in `gh migrate --help`.  A command's
+# module (and what it imports) is only loaded when the command is run, so
+# a call doesn't pay for importing every command's dependencies.
+COMMANDS = {
+    "start": ("migrate.commands.start", "Creates a migration workbook"),
+    "report": ("migrate.commands.report", "Generate reports"),
+    "stats": (
+        "migrate.commands.stats",
+        "Captures stats on the source/target environments",
+    ),
+    "load": ("migrate.commands.load", "Load .csv files into migration workbook"),
+    "scripts": ("migrate.commands.scripts", "Generate a wave's scripts"),
+    "get": ("migrate.commands.get", "Download migration logs"),
+    "snapshots": (
+        "migrate.commands.snapshots",
+        "Snapshot the users, teams and repos of orgs",
+    ),
+    "manns": ("migrate.commands.manns", "Map mannequins to target users"),
+    "predict": (
+        "migrate.commands.predict",
+        "Predict repo migration times from past waves",
+    ),
+    "plan": ("migrate.commands.plan", "Assign orgs to waves in 'Mapping - Org'"),
+    "execute": ("migrate.commands.execute", "Run a wave's migrations in parallel"),
+    "status": (
+        "migrate.commands.status",
+        "Watch the migration status of a wave's target orgs",
+    ),
+    "apply": (
+        "migrate.commands.apply",
+        "Apply the post-migration actions through the GitHub API",
+    ),
+    "archive": (
+        "migrate.commands.archive",
+        "Archive (or unarchive) a wave's source repos and verify them",
+    ),
+    "reclaim": (
+        "migrate.commands.reclaim",
+        "Reclaim a wave's mapped mannequins through the GitHub API",
+    ),
+    "store": (
+        "migrate.commands.store",
+        "Store and query every wave's stats, snapshots, logs and mappings",
+    ),
+}
+
+
+class LazyGroup(click.Group):
+    """A group that imports each command's module only when it's run"""
+
+    def list_commands(self, ctx):
+        return list(COMMANDS)
+
+    def get_command(self, ctx, name):
+        if name not in COMMANDS:
+            return None
 
-@click.group()
-def cli():
-    pass
+        module = importlib.import_module(COMMANDS[name][0])
+
+        return getattr(module, name)
+
+    def format_commands(self, ctx, formatter):
+        # Without loading every command for its help
+        with formatter.section("Commands"):
+            formatter.write_dl([(name, help) for name, (_, help) in COMMANDS.items()])
+
+
+@click.group(cls=LazyGroup)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Write a CPU profile, phase timings and peak memory to logs/debug/",
+)
+@click.pass_context
+def cli(ctx, profile):
+    if profile:
+        start_profiling()
+        ctx.call_on_close(lambda: stop_profiling(ctx.invoked_subcommand))
 
 
 # Create logs directory if it doesn't exist
@@ -39,14 +108,5 @@ logger.add(
 
 logger.add("logs/debug/error.log", format="{time} {level} {message}", level="ERROR")
 
-cli.add_command(start)
-cli.add_command(report)
-cli.add_command(stats)
-cli.add_command(load)
-cli.add_command(scripts)
-cli.add_command(get)
-cli.add_command(snapshots)
-cli.add_command(manns)
-
 if __name__ == "__main__":
     cli()
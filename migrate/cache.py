@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import closing, contextmanager
+from loguru import logger
+
+# Shared across waves, so later waves only look up what's new
+CACHE_PATH = os.path.join("logs", "cache", "users.sqlite")
+
+# Hours before a cached entry is looked up again
+DEFAULT_TTL = 24 * 7
+
+# Kinds keyed by node ID, which (unlike logins and emails) are case-sensitive
+NODE_ID_KINDS = {"mannequin", "mapping-id"}
+
+
+@contextmanager
+def get_cache(path=CACHE_PATH):
+    """
+    Opens (and creates, if needed) the user cache, committing when the block
+    succeeds and closing it either way
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with closing(sqlite3.connect(path)) as connection, connection:
+        create_tables(connection)
+        yield connection
+
+
+def create_tables(connection):
+    """Creates the table of cached entries"""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (kind, key)
+        )
+        """
+    )
+
+
+def get_key(kind, key):
+    """Returns the key an entry is stored under"""
+
+    key = str(key)
+
+    return key if kind in NODE_ID_KINDS else key.lower()
+
+
+def cache_get_many(kind, keys, ttl=DEFAULT_TTL, path=CACHE_PATH):
+    """
+    Returns {key: value} for the keys cached less than ttl hours ago.  Keys
+    are case-insensitive, like GitHub logins, except for NODE_ID_KINDS.
+    """
+
+    if not ttl:
+        return {}
+
+    keys = {get_key(kind, key): key for key in keys}
+    oldest = time.time() - ttl * 3600
+
+    found = {}
+
+    with get_cache(path) as cache:
+        # Stay under SQLite's limit on query parameters
+        batch = list(keys)
+        for start in range(0, len(batch), 500):
+            chunk = batch[start : start + 500]
+            rows = cache.execute(
+                f"SELECT key, value FROM entries WHERE kind = ? AND updated_at >= ? "
+                f"AND key IN ({', '.join('?' * len(chunk))})",
+                [kind, oldest] + chunk,
+            )
+            for key, value in rows:
+                found[keys[key]] = json.loads(value)
+
+    logger.info(f"** Cache: {len(found)}/{len(keys)} {kind} entries found")
+
+    return found
+
+
+def cache_put_many(kind, items, path=CACHE_PATH):
+    """Stores {key: value} items in the cache"""
+
+    now = time.time()
+
+    with get_cache(path) as cache:
+        cache.executemany(
+            "INSERT OR REPLACE INTO entries (kind, key, value, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (kind, get_key(kind, key), json.dumps(value, default=str), now)
+                for key, value in items.items()
+            ],
+        )
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import click
+import pandas as pd
+from githubkit import GitHub
+from githubkit.exception import RequestFailed
+from loguru import logger
+
+from migrate.commands.scripts import get_post_migration_plan, get_post_migration_actions
+from migrate.commands.stats import auto_retry_handler
+
+
+@click.command()
+@click.option("--pat", "pat", required=True)
+@click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option(
+    "--max-concurrency",
+    type=int,
+    default=10,
+    help="Maximum number of API requests in flight",
+)
+@click.option(
+    "--rate",
+    type=float,
+    default=5,
+    help="Maximum number of API requests started per second",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Apply every action, even those the after-target snapshots show are done",
+)
+@click.argument("output_dir", required=False, default="logs")
+def apply(pat, dry_run, wave, workbook_path, max_concurrency, rate, full, output_dir):
+    """
+    Apply the post-migration actions directly through the GitHub API.
+    """
+
+    if dry_run:
+        output_dir = os.path.join(output_dir, "dry-run")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    actions = []
+    for plan in get_post_migration_plan(workbook_path, dry_run, wave, full):
+        actions.extend(get_post_migration_actions(plan))
+
+    logger.info(f"* Applying {len(actions)} post-migration actions for wave {wave}")
+
+    results = asyncio.run(run_actions(pat, actions, max_concurrency, rate))
+
+    results_path = os.path.join(output_dir, f"post-migration-wave-{wave}.csv")
+    results.to_csv(results_path, index=False)
+
+    failed = results[results["error"] != ""]
+    logger.info(
+        f"* Applied {len(results) - len(failed)}/{len(results)} actions, "
+        f"see {results_path}"
+    )
+
+
+async def run_actions(pat, actions, max_concurrency, rate):
+    """
+    Runs the actions stage by stage, with up to max_concurrency requests in
+    flight and no more than rate requests started per second
+    """
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pace = make_pacer(rate)
+
+    results = []
+
+    async with GitHub(pat, auto_retry=auto_retry_handler) as github:
+        for stage in sorted({action["stage"] for action in actions}):
+            stage_actions = [a for a in actions if a["stage"] == stage]
+            logger.info(f"** Stage {stage}: {len(stage_actions)} actions")
+
+            results.extend(
+                await asyncio.gather(
+                    *[
+                        run_action(github, semaphore, pace, action)
+                        for action in stage_actions
+                    ]
+                )
+            )
+
+    return pd.DataFrame(
+        results,
+        columns=["target_org", "stage", "action", "method", "url", "status", "error"],
+    )
+
+
+def make_pacer(rate):
+    """Returns a coroutine that waits until the next request may start"""
+
+    lock = asyncio.Lock()
+    next_start = time.monotonic()
+
+    async def pace():
+        nonlocal next_start
+
+        async with lock:
+            now = time.monotonic()
+            if next_start > now:
+                await asyncio.sleep(next_start - now)
+            next_start = max(now, next_start) + 1 / rate
+
+    return pace
+
+
+async def run_action(github, semaphore, pace, action):
+    """Runs a single action, returning its result"""
+
+    result = {k: action[k] for k in ["target_org", "stage", "action", "method", "url"]}
+
+    async with semaphore:
+        await pace()
+
+        try:
+            response = await github.arequest(
+                action["method"], action["url"], json=action["data"]
+            )
+            result["status"] = response.status_code
+            result["error"] = ""
+        except RequestFailed as e:
+            result["status"] = e.response.status_code
+            result["error"] = str(e)
+        except Exception as e:
+            result["status"] = None
+            result["error"] = str(e)
+
+    if result["error"]:
+        logger.info(f"*** {action['action']} {action['url']} failed: {result['error']}")
+
+    return result
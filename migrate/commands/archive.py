@@ -0,0 +1,168 @@
+import os
+import asyncio
+import click
+import pandas as pd
+from githubkit import GitHub
+from githubkit.exception import GraphQLFailed
+from loguru import logger
+
+from migrate.commands.apply import run_actions
+from migrate.commands.stats import auto_retry_handler
+
+
+@click.command()
+@click.option("--pat", "pat", required=True)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    help="Only check and report which repos would be updated",
+)
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "--unarchive",
+    is_flag=True,
+    help="Restore each repo's archived state from before the migration",
+)
+@click.option(
+    "--max-concurrency",
+    type=int,
+    default=10,
+    help="Maximum number of API requests in flight",
+)
+@click.option(
+    "--rate",
+    type=float,
+    default=5,
+    help="Maximum number of API requests started per second",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=100,
+    help="Number of repos checked per GraphQL request",
+)
+@click.argument("output_dir", required=False, default="logs")
+def archive(
+    pat, dry_run, wave, unarchive, max_concurrency, rate, batch_size, output_dir
+):
+    """
+    Archive (or unarchive) a wave's source repos, then verify them.  With
+    --dry-run, the repos are only checked, never updated.
+    """
+
+    if unarchive:
+        logger.info(f"\n* Unarchiving repos for wave: {wave}")
+        stats_file = os.path.join(output_dir, f"before-source-wave-{int(wave)}.csv")
+    else:
+        # We assume that a dry-run was completed
+        logger.info(f"\n* Archiving repos for wave: {wave}")
+        stats_file = os.path.join(
+            output_dir, "dry-run", f"before-source-wave-{int(wave)}.csv"
+        )
+
+    if dry_run:
+        output_dir = os.path.join(output_dir, "dry-run")
+
+    repos = pd.read_csv(stats_file)
+
+    # Workaround for issue where CSV has blank lines
+    repos = repos.dropna(subset=["name", "owner.login"])
+
+    if unarchive:
+        repos["archived"] = repos["isArchived"].astype(bool)
+    else:
+        repos["archived"] = True
+
+    repos = repos[["owner.login", "name", "archived"]].to_dict(orient="records")
+
+    ##########################################
+    # Update the repos
+    ##########################################
+    actions = [
+        {
+            "target_org": repo["owner.login"],
+            "stage": 0,
+            "action": "archive" if repo["archived"] else "unarchive",
+            "method": "PATCH",
+            "url": f"/repos/{repo['owner.login']}/{repo['name']}",
+            "data": {"archived": repo["archived"]},
+        }
+        for repo in repos
+    ]
+
+    if dry_run:
+        logger.info(f"* Dry-run: not updating {len(actions)} repos")
+        results = pd.DataFrame(
+            actions, columns=["target_org", "stage", "action", "method", "url"]
+        )
+        results["status"] = None
+        results["error"] = ""
+    else:
+        results = asyncio.run(run_actions(pat, actions, max_concurrency, rate))
+
+    ##########################################
+    # Verify the repos
+    ##########################################
+    logger.info(f"* Verifying {len(repos)} repos")
+    states = asyncio.run(get_archived_states(pat, repos, batch_size))
+
+    results["isArchived"] = states
+    results["verified"] = [
+        state == repo["archived"] for state, repo in zip(states, repos)
+    ]
+
+    results_path = os.path.join(
+        output_dir,
+        f"{'unarchive' if unarchive else 'archive'}-repos-wave-{wave}.csv",
+    )
+    results.to_csv(results_path, index=False)
+
+    stragglers = results[~results["verified"]]
+    logger.info(
+        f"* {len(results) - len(stragglers)}/{len(results)} repos verified, "
+        f"see {results_path}"
+    )
+    for url in stragglers["url"]:
+        logger.info(f"** {'Would update' if dry_run else 'Not updated'}: {url}")
+
+
+async def get_archived_states(pat, repos, batch_size):
+    """
+    Returns each repo's isArchived state (None if it couldn't be read),
+    reading batch_size repos per aliased GraphQL request
+    """
+
+    states = []
+
+    async with GitHub(pat, auto_retry=auto_retry_handler) as github:
+        for start in range(0, len(repos), batch_size):
+            batch = repos[start : start + batch_size]
+
+            params = ", ".join(
+                f"$owner{i}: String!, $name{i}: String!" for i in range(len(batch))
+            )
+            aliases = "\n".join(
+                f"  repo{i}: repository(owner: $owner{i}, name: $name{i}) "
+                "{ isArchived }"
+                for i in range(len(batch))
+            )
+            query = f"query ({params}) {{\n{aliases}\n}}"
+
+            variables = {}
+            for i, repo in enumerate(batch):
+                variables[f"owner{i}"] = repo["owner.login"]
+                variables[f"name{i}"] = repo["name"]
+
+            try:
+                data = await github.async_graphql(query, variables=variables)
+            except GraphQLFailed as e:
+                # Missing repos are reported as errors, keep the rest
+                for error in e.response.errors:
+                    logger.info(f"Error: {error.message}")
+                data = e.response.data or {}
+
+            for i in range(len(batch)):
+                repo = data.get(f"repo{i}")
+                states.append(repo["isArchived"] if repo else None)
+
+    return states
@@ -0,0 +1,222 @@
+import os
+import time
+import click
+import subprocess
+import pandas as pd
+from loguru import logger
+
+from migrate.workbook import get_orgs_for_wave_df
+
+
+@click.command()
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "--by",
+    "granularity",
+    type=click.Choice(["org", "repo"]),
+    default="repo",
+    help="Run one `gh gei migrate-org` per org, or one `migrate-repo` per repo",
+)
+@click.option(
+    "--max-jobs",
+    type=int,
+    default=10,
+    help="Maximum number of migrations in flight",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=5,
+    help="Seconds between job status checks",
+)
+@click.option("--source-pat", envvar="GH_SOURCE_PAT", required=True)
+@click.option("--target-pat", envvar="GH_TARGET_PAT", required=True)
+@click.option(
+    "--target-enterprise", help="Target enterprise slug (for --by org)", default=None
+)
+@click.option(
+    "--gh", "gh", default="gh", help="GitHub CLI executable used to run `gh gei`"
+)
+@click.argument("output_dir", required=False, default="logs")
+def execute(
+    workbook_path,
+    dry_run,
+    wave,
+    granularity,
+    max_jobs,
+    poll_interval,
+    source_pat,
+    target_pat,
+    target_enterprise,
+    gh,
+    output_dir,
+):
+    """
+    Run a wave's migrations, keeping several in flight at once.
+    """
+
+    if dry_run:
+        output_dir = os.path.join(output_dir, "dry-run")
+        target_column = "dry_run_target_name"
+    else:
+        target_column = "target_name"
+
+    if granularity == "org" and target_enterprise is None:
+        raise click.UsageError("--target-enterprise is required with --by org")
+
+    orgs = get_orgs_for_wave_df(wave, workbook_path).sort_values("order")
+
+    ##########################################
+    # Build the jobs
+    ##########################################
+    gei = [gh, "gei"]
+    pats = ["--github-source-pat", source_pat, "--github-target-pat", target_pat]
+
+    if granularity == "org":
+        jobs = [
+            {
+                "name": org["source_name"],
+                "command": gei
+                + [
+                    "migrate-org",
+                    "--github-target-enterprise",
+                    target_enterprise,
+                    "--github-source-org",
+                    org["source_name"],
+                    "--github-target-org",
+                    org[target_column],
+                ]
+                + pats
+                + ["--verbose"],
+            }
+            for org in orgs.to_dict(orient="records")
+        ]
+    else:
+        repos = get_repos_largest_first(
+            os.path.join(output_dir, f"before-source-wave-{wave}.csv"),
+            orgs,
+            target_column,
+        )
+        jobs = [
+            {
+                "name": f"{repo['owner.login']}/{repo['name']}",
+                "command": gei
+                + [
+                    "migrate-repo",
+                    "--github-source-org",
+                    repo["owner.login"],
+                    "--source-repo",
+                    repo["name"],
+                    "--github-target-org",
+                    repo["target_org"],
+                    "--target-repo",
+                    repo["name"],
+                ]
+                + pats
+                + ["--verbose"],
+            }
+            for repo in repos.to_dict(orient="records")
+        ]
+
+    ##########################################
+    # The main event
+    ##########################################
+    logger.info(f"* Migrating {len(jobs)} {granularity}s, {max_jobs} at a time")
+
+    jobs_dir = os.path.join(output_dir, f"migration-jobs-wave-{wave}")
+    results = run_jobs(jobs, max_jobs, poll_interval, jobs_dir)
+
+    results_path = os.path.join(output_dir, f"migration-jobs-wave-{wave}.csv")
+    results.to_csv(results_path, index=False)
+
+    failed = results[results["returncode"] != 0]
+    logger.info(
+        f"* Migrated {len(results) - len(failed)}/{len(results)} {granularity}s, "
+        f"see {results_path}"
+    )
+    for name in failed["name"]:
+        logger.info(f"** Failed: {name}")
+
+
+def get_repos_largest_first(stats_path, orgs, target_column):
+    """
+    Returns the wave's repos from a `gh migrate stats` file, largest first
+    """
+
+    repos = pd.read_csv(stats_path, usecols=["owner.login", "name", "diskUsage"])
+
+    # Workaround for issue where CSV has blank lines
+    repos = repos.dropna(subset=["owner.login", "name"])
+
+    repos = repos.merge(
+        orgs[["source_name", target_column]].rename(
+            columns={"source_name": "owner.login", target_column: "target_org"}
+        ),
+        how="inner",
+        on="owner.login",
+    )
+
+    return repos.sort_values("diskUsage", ascending=False)
+
+
+def run_jobs(jobs, max_jobs, poll_interval, jobs_dir):
+    """
+    Runs the jobs' commands in order, keeping up to max_jobs running and
+    polling them for completion.  Each job's output is written to its own
+    log in jobs_dir.
+    """
+
+    os.makedirs(jobs_dir, exist_ok=True)
+
+    pending = list(reversed(jobs))
+    running = []
+    results = []
+
+    while pending or running:
+        # Start jobs until the limit is reached
+        while pending and len(running) < max_jobs:
+            job = pending.pop()
+            log_path = os.path.join(jobs_dir, f"{job['name'].replace('/', '__')}.log")
+            log = open(log_path, "w")
+
+            logger.info(f"** Starting {job['name']}")
+            process = subprocess.Popen(
+                job["command"], stdout=log, stderr=subprocess.STDOUT
+            )
+            running.append((job, process, log, log_path, time.monotonic()))
+
+        time.sleep(poll_interval)
+
+        # Collect the jobs that have finished
+        still_running = []
+        for job, process, log, log_path, start in running:
+            if process.poll() is None:
+                still_running.append((job, process, log, log_path, start))
+                continue
+
+            log.close()
+            duration = time.monotonic() - start
+            status = "succeeded" if process.returncode == 0 else "failed"
+            logger.info(f"** {job['name']} {status} in {duration / 60:.1f} mins")
+
+            results.append(
+                {
+                    "name": job["name"],
+                    "returncode": process.returncode,
+                    "duration (mins)": round(duration / 60, 1),
+                    "log": log_path,
+                }
+            )
+        running = still_running
+
+    return pd.DataFrame(
+        results, columns=["name", "returncode", "duration (mins)", "log"]
+    )
@@ -1,9 +1,15 @@
 import click
 import pandas as pd
 
+import io
 import os
+import asyncio
+import tarfile
+import httpx
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from githubkit import GitHub
+from githubkit.exception import GraphQLFailed
 
 import subprocess
 from datetime import datetime
@@ -45,7 +51,23 @@ def get():
 )
 @click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
 @click.option("-o", "--output", "output", required=True, default="logs")
-def logs(orgs, pat, wave, workbook_path, dry_run, output):
+@click.option(
+    "--max-jobs",
+    type=int,
+    default=10,
+    help="Maximum number of orgs fetched at once",
+)
+@click.option(
+    "--tarball",
+    is_flag=True,
+    help="Download only the success/failure logs, instead of cloning the repo",
+)
+@click.option(
+    "--api",
+    is_flag=True,
+    help="Download each repo's log from the migration API (within 24 hours)",
+)
+def logs(orgs, pat, wave, workbook_path, dry_run, output, max_jobs, tarball, api):
     logger.info(f"* Checking {orgs}")
 
     if dry_run:
@@ -64,37 +86,219 @@ def logs(orgs, pat, wave, workbook_path, dry_run, output):
         else:
             orgs = get_orgs_for_wave("target_name", wave, workbook_path)
 
-    if orgs is not None:
-        for org in orgs:
-            logger.info(f"\n* Processing org {org}")
-            get_org_log(pat, org, output)
+    if orgs is not None and api:
+        logger.info(f"\n* Downloading repo logs for {len(orgs)} orgs")
+        results = asyncio.run(get_api_logs(pat, orgs, output, max_jobs))
+
+        logger.info(f"* Downloaded {sum(results)}/{len(results)} repo logs")
 
+    elif orgs is not None:
+        logger.info(f"\n* Processing {len(orgs)} orgs, {max_jobs} at a time")
 
-def get_org_log(pat, org, output_dir):
-    """Process all repos in an org"""
+        # Each org is mostly waiting on the network, so threads are enough
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            results = list(
+                executor.map(lambda org: get_org_log(pat, org, output, tarball), orgs)
+            )
+
+        logger.info(f"* Retrieved logs for {sum(results)}/{len(orgs)} orgs")
+
+
+def get_org_log(pat, org, output_dir, tarball=False):
+    """
+    Retrieves an org's gei-migration-results repo, updating an existing
+    clone in place.  Returns whether it succeeded.
+    """
 
     output_dir = f"{output_dir}/{org}"
 
+    if tarball:
+        return get_org_log_tarball(pat, org, output_dir)
+
     env = os.environ.copy()
     env["GITHUB_TOKEN"] = pat
 
-    # Define the command
-    command = [
-        "gh",
-        "repo",
-        "clone",
-        f"https://github.com/{org}/gei-migration-results",
-        output_dir,
-    ]
+    if os.path.isdir(os.path.join(output_dir, ".git")):
+        # Only fetch what's new since the last run
+        command = ["gh", "repo", "sync"]
+        cwd = output_dir
+    else:
+        # We only need the latest logs, not their history
+        command = [
+            "gh",
+            "repo",
+            "clone",
+            f"https://github.com/{org}/gei-migration-results",
+            output_dir,
+            "--",
+            "--depth",
+            "1",
+        ]
+        cwd = None
 
     # Run the command
     result = subprocess.run(
-        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd
     )
 
     if result.returncode == 0:
-        logger.info("Retrieved migration logs successfully!")
+        logger.info(f"Retrieved migration logs for {org} successfully!")
     else:
         logger.info(
-            f'Failed to retrieve migration logs: {result.stderr.decode("utf-8")}'
+            f"Failed to retrieve migration logs for {org}: "
+            f'{result.stderr.decode("utf-8")}'
+        )
+
+    return result.returncode == 0
+
+
+def get_org_log_tarball(pat, org, output_dir):
+    """
+    Downloads the gei-migration-results repo as a tarball, extracting only
+    the success/failure logs
+    """
+
+    github = GitHub(pat)
+
+    try:
+        # The default branch, redirected to a codeload download
+        response = github.request("GET", f"/repos/{org}/gei-migration-results/tarball")
+    except Exception as e:
+        logger.info(f"Failed to retrieve migration logs for {org}: {e}")
+        return False
+
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as archive:
+        for member in archive.getmembers():
+            # Drop the "<owner>-<repo>-<sha>/" top-level directory
+            parts = member.name.split("/", 1)
+            if len(parts) < 2 or not parts[1].startswith(("success/", "failure/")):
+                continue
+            if not member.isfile():
+                continue
+
+            path = os.path.join(output_dir, parts[1])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(archive.extractfile(member).read())
+
+    logger.info(f"Retrieved migration logs for {org} successfully!")
+
+    return True
+
+
+# Migrations in these states have a log to download
+FAILED_STATES = ["FAILED", "FAILED_VALIDATION"]
+LOGGED_STATES = ["SUCCEEDED"] + FAILED_STATES
+
+
+async def get_api_logs(pat, orgs, output_dir, max_jobs, retries=3):
+    """
+    Downloads the log of each org's latest migration of each repo into
+    <org>/success|failure/<repo>.md, with up to max_jobs downloads at once.
+    Returns whether each download succeeded.
+    """
+
+    semaphore = asyncio.Semaphore(max_jobs)
+
+    async with GitHub(pat) as github, httpx.AsyncClient(timeout=60) as client:
+        migrations = await asyncio.gather(
+            *[get_repo_migrations(github, org) for org in orgs]
         )
+
+        return await asyncio.gather(
+            *[
+                download_repo_log(
+                    github, client, semaphore, org, migration, output_dir, retries
+                )
+                for org, org_migrations in zip(orgs, migrations)
+                for migration in org_migrations
+            ]
+        )
+
+
+async def get_repo_migrations(github, org):
+    """Returns the latest finished migration of each of the org's repos"""
+
+    with open("migrate/graphql/repository-migrations.graphql") as f:
+        query = f.read()
+
+    variables = {"login": org, "pageSize": 100, "endCursor": None}
+    migrations = {}
+
+    while True:
+        response = await github.async_graphql(query, variables=variables)
+        page = response["organization"]["repositoryMigrations"]
+
+        for migration in page["nodes"]:
+            if migration["state"] not in LOGGED_STATES:
+                continue
+
+            # Keep only the latest attempt at each repo
+            latest = migrations.get(migration["repositoryName"])
+            if latest is None or migration["createdAt"] > latest["createdAt"]:
+                migrations[migration["repositoryName"]] = migration
+
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+
+        variables["endCursor"] = page["pageInfo"]["endCursor"]
+
+    logger.info(f"** {org}: {len(migrations)} repo migrations")
+
+    return list(migrations.values())
+
+
+async def download_repo_log(
+    github, client, semaphore, org, migration, output_dir, retries
+):
+    """
+    Downloads a repo's migration log.  Log URLs expire after a few minutes,
+    so a rejected URL is looked up again and retried.
+    """
+
+    type = "failure" if migration["state"] in FAILED_STATES else "success"
+    path = os.path.join(output_dir, org, type, f"{migration['repositoryName']}.md")
+
+    url = migration["migrationLogUrl"]
+
+    async with semaphore:
+        for attempt in range(retries + 1):
+            if url:
+                try:
+                    response = await client.get(url)
+                except httpx.HTTPError as e:
+                    logger.info(f"Error: {e}")
+                    response = None
+
+                if response is not None and response.status_code == 200:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as f:
+                        f.write(response.content)
+                    return True
+
+            if attempt < retries:
+                await asyncio.sleep(2**attempt)
+                url = await get_migration_log_url(github, migration["id"])
+
+    logger.info(
+        f"*** Couldn't download the log for {org}/{migration['repositoryName']}"
+    )
+
+    return False
+
+
+async def get_migration_log_url(github, migration_id):
+    """Returns a fresh log URL for a migration"""
+
+    try:
+        response = await github.async_graphql(
+            "query ($id: ID!) { node(id: $id) "
+            "{ ... on RepositoryMigration { migrationLogUrl } } }",
+            variables={"id": migration_id},
+        )
+    except GraphQLFailed as e:
+        for error in e.response.errors:
+            logger.info(f"Error: {error.message}")
+        return None
+
+    return (response["node"] or {}).get("migrationLogUrl")
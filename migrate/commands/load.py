@@ -27,33 +27,38 @@ def load():
     required=False,
     default="./report/InfoMagnus - Migration Workbook.xlsx",
 )
+@click.option(
+    "--sidecar",
+    type=click.Choice(["csv", "parquet"]),
+    help="Write tables too long for a sheet to compressed files, instead of splitting them",
+)
 # @snapshot_before_after()
-def inventory(before_source, before_target, workbook_path):
+def inventory(before_source, before_target, workbook_path, sidecar):
     "" ""
 
-    workbook = get_workbook(workbook_path)
-
-    source_stats = pd.read_csv(
-        before_source,
-        parse_dates=["updatedAt", "pushedAt"],
-    )
-    logger.info(f"*** Loading inventory")
-    add_inventory_worksheet(workbook, "Inventory - Source Repos", source_stats)
-
-    # If before_file exists
-    if os.path.exists(before_target):
-        target_stats = pd.read_csv(
-            before_target,
+    with workbook_session(workbook_path, sidecar) as workbook:
+        source_stats = pd.read_csv(
+            before_source,
             parse_dates=["updatedAt", "pushedAt"],
         )
+        logger.info(f"*** Loading inventory")
+        source_stats = add_risk_columns(source_stats)
+        add_inventory_worksheet(workbook, "Inventory - Source Repos", source_stats)
+
+        # If before_file exists
+        if os.path.exists(before_target):
+            target_stats = pd.read_csv(
+                before_target,
+                parse_dates=["updatedAt", "pushedAt"],
+            )
 
-        add_inventory_worksheet(workbook, "Inventory - Target Repos", target_stats)
+            add_inventory_worksheet(workbook, "Inventory - Target Repos", target_stats)
 
-    logger.info(f"*** Generating pre-migration report")
-    add_pre_migration_report(workbook, "Pre-migration Report", source_stats)
-    logger.info(f"*** Adding org mapping")
-    add_org_mapping(workbook, "Mapping - Org", source_stats)
-    logger.info(f"*** Adding user mapping")
-    add_user_mapping(workbook, "Mapping - User", source_stats)
+        logger.info(f"*** Generating pre-migration report")
+        add_pre_migration_report(workbook, "Pre-migration Report", source_stats)
+        logger.info(f"*** Adding org mapping")
+        add_org_mapping(workbook, "Mapping - Org", source_stats)
+        logger.info(f"*** Adding user mapping")
+        add_user_mapping(workbook, "Mapping - User", source_stats)
 
     logger.info(f"*** Migration workbook updated")
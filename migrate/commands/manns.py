@@ -4,8 +4,11 @@ import pandas as pd
 import os
 from functools import lru_cache
 from githubkit import GitHub
+from githubkit.exception import GraphQLFailed
 from migrate.version import *
 from migrate.workbook import *
+from migrate.matching import match_mannequins
+from migrate.cache import DEFAULT_TTL, cache_get_many, cache_put_many
 from loguru import logger
 
 
@@ -21,9 +24,23 @@ from loguru import logger
     required=False,
     default="./report/InfoMagnus - Migration Workbook.xlsx",
 )
+@click.option(
+    "--min-confidence",
+    type=float,
+    default=0.8,
+    help="Minimum match confidence to fill in target-user",
+)
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=DEFAULT_TTL,
+    help="Hours to reuse cached profiles and mappings (0 to always look up)",
+)
 @click.argument("output_dir", required=False, default="logs")
 # @snapshot_before_after()
-def manns(orgs, pat, dry_run, wave, workbook_path, output_dir):
+def manns(
+    orgs, pat, dry_run, wave, workbook_path, min_confidence, cache_ttl, output_dir
+):
     github = GitHub(pat)
 
     if dry_run:
@@ -67,51 +84,100 @@ def manns(orgs, pat, dry_run, wave, workbook_path, output_dir):
                     [mann for mann in get_mannequins(github, org)]
                 )
 
-                mannequins.drop(columns=["claimant", "email"], inplace=True)
+                mannequins.drop(columns=["claimant"], inplace=True)
+                mannequins.rename(columns={"email": "mannequin-email"}, inplace=True)
                 mannequins.rename(columns={"login": "mannequin-user"}, inplace=True)
                 mannequins.rename(columns={"id": "mannequin-id"}, inplace=True)
                 mannequins["target-user"] = ""
                 mannequins["target_org"] = org
 
-                for _, mann in mannequins.iterrows():
-                    response = github.rest.users.get_by_username(mann["mannequin-user"])
-                    # Convert response to dataframe
-                    response = pd.DataFrame([response.json()])
-
-                    # Merge mann with response
-                    mann_df = pd.DataFrame([mann])
-                    merged_df = pd.merge(
-                        mann_df, response, left_on="mannequin-user", right_on="login"
-                    )
-
-                    # Remove columns ending with _url
-                    url_cols = [col for col in merged_df.columns if col.endswith("url")]
-                    merged_df.drop(columns=url_cols, inplace=True)
-
-                    ignore_cols = [
-                        "login",
-                        "id",
-                        "createdAt",
-                        "node_id",
-                        "gravatar_id",
-                        "type",
-                        "site_admin",
-                        "hireable",
-                        "public_repos",
-                        "public_gists",
-                        "followers",
-                        "following",
-                    ]
-                    merged_df.drop(columns=ignore_cols, inplace=True)
-
-                    # Add merged_df to users
-                    users.append(merged_df)
+                users.append(mannequins)
 
             else:
                 raise ValueError("Invalid source/target")
 
-    wb = get_workbook(workbook_path)
-    update_manns_worksheet(wb, "Mapping - User", users)
+    ##########################################
+    # Look up the users' profiles in batches
+    ##########################################
+    users = pd.concat(users, ignore_index=True)
+
+    # Mannequins seen in earlier waves remember whether their login has a
+    # profile, so those without one aren't looked up again
+    known = cache_get_many(
+        "mannequin", users["mannequin-id"].dropna().unique(), cache_ttl
+    )
+    no_profile = {
+        mann["mannequin-user"]
+        for mann in known.values()
+        if not mann.get("has-profile", True)
+    }
+
+    profiles = get_user_profiles(
+        github,
+        [
+            login
+            for login in users["mannequin-user"].unique()
+            if login not in no_profile
+        ],
+        ttl=cache_ttl,
+    )
+
+    # Remember the mannequins by node ID for later waves
+    found = set(profiles["login"])
+    cache_put_many(
+        "mannequin",
+        {
+            mann["mannequin-id"]: mann
+            | {"has-profile": mann["mannequin-user"] in found}
+            for mann in users[["mannequin-user", "mannequin-id", "target_org"]]
+            .dropna(subset=["mannequin-id"])
+            .to_dict(orient="records")
+        },
+    )
+
+    # Merge the profiles in one go
+    users = users.merge(
+        profiles, how="left", left_on="mannequin-user", right_on="login"
+    )
+
+    ignore_cols = ["login", "createdAt"]
+    users.drop(columns=ignore_cols, inplace=True)
+
+    ##########################################
+    # Match the mannequins to org members
+    ##########################################
+    matches = []
+    for org, org_users in users.groupby("target_org"):
+        members = pd.DataFrame(
+            [member for member in get_members(github, org)],
+            columns=["login", "name", "email"],
+        )
+        matches.append(match_mannequins(org_users, members))
+
+    users = users.join(pd.concat(matches))
+
+    # Set by the reviewer to accept a proposed match, so it's remembered for
+    # later waves (see scripts post_migration)
+    users["reviewed"] = False
+
+    # Mappings confirmed in earlier waves win over any proposed match
+    confirmed = get_confirmed_mappings(users, cache_ttl)
+    users.loc[confirmed.index, "proposed-user"] = confirmed
+    users.loc[confirmed.index, "match-confidence"] = 1.0
+    users.loc[confirmed.index, "match-method"] = "confirmed"
+    users.loc[confirmed.index, "reviewed"] = True
+
+    # Only fill in the confident matches, the rest are left to review
+    confident = users["match-confidence"] >= min_confidence
+    users.loc[confident, "target-user"] = users.loc[confident, "proposed-user"]
+
+    logger.info(
+        f"* Matched {confident.sum()}/{len(users)} mannequins "
+        f"(confidence >= {min_confidence})"
+    )
+
+    with workbook_session(workbook_path) as wb:
+        update_manns_worksheet(wb, "Mapping - User", users)
 
 
 def get_mannequins(github, org):
@@ -123,6 +189,99 @@ def get_mannequins(github, org):
     )
 
 
+def get_members(github, org):
+    yield from get_nodes(
+        github,
+        "org-members",
+        {"login": org, "pageSize": 100, "endCursor": None},
+        ["organization", "membersWithRole"],
+    )
+
+
+def get_confirmed_mappings(users, ttl=DEFAULT_TTL):
+    """
+    Returns the cached target-user of each mannequin that was confirmed in an
+    earlier wave, looked up by node ID and then by login
+    """
+
+    by_id = cache_get_many("mapping-id", users["mannequin-id"].dropna().unique(), ttl)
+    by_login = cache_get_many("mapping", users["mannequin-user"].unique(), ttl)
+
+    confirmed = users["mannequin-id"].map(by_id)
+    confirmed = confirmed.fillna(users["mannequin-user"].map(by_login))
+
+    return confirmed.dropna()
+
+
+def get_user_profiles(github, logins, batch_size=100, ttl=DEFAULT_TTL):
+    """
+    Retrieves the profiles of many users, looking up batch_size users per
+    GraphQL request with one aliased user(login:) field per user.  Profiles
+    cached less than ttl hours ago aren't looked up again.
+    """
+
+    # Named after the REST API fields they replace
+    fields = """
+        name
+        company
+        blog: websiteUrl
+        location
+        email
+        bio
+        twitter_username: twitterUsername
+        created_at: createdAt
+        updated_at: updatedAt
+    """
+
+    cached = cache_get_many("profile", logins, ttl)
+    profiles = list(cached.values())
+
+    logins = [login for login in logins if login not in cached]
+    fetched = {}
+
+    for start in range(0, len(logins), batch_size):
+        batch = logins[start : start + batch_size]
+
+        params = ", ".join(f"$login{i}: String!" for i in range(len(batch)))
+        aliases = "\n".join(
+            f"  user{i}: user(login: $login{i}) {{{fields}}}" for i in range(len(batch))
+        )
+        query = f"query ({params}) {{\n{aliases}\n}}"
+        variables = {f"login{i}": login for i, login in enumerate(batch)}
+
+        try:
+            data = github.graphql(query, variables=variables)
+        except GraphQLFailed as e:
+            # Users that can't be found are reported as errors, keep the rest
+            for error in e.response.errors:
+                logger.info(f"Error: {error.message}")
+            data = e.response.data or {}
+
+        for i, login in enumerate(batch):
+            profile = data.get(f"user{i}")
+            if profile:
+                fetched[login] = {"login": login, **profile}
+
+    cache_put_many("profile", fetched)
+    profiles.extend(fetched.values())
+
+    return pd.DataFrame(
+        profiles,
+        columns=[
+            "login",
+            "name",
+            "company",
+            "blog",
+            "location",
+            "email",
+            "bio",
+            "twitter_username",
+            "created_at",
+            "updated_at",
+        ],
+    )
+
+
 def get_nodes(github, query_name, variables, page_path):
     """Retrieves all nodes from a paginated GraphQL query"""
 
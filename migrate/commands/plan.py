@@ -0,0 +1,235 @@
+import heapq
+import click
+import pandas as pd
+from loguru import logger
+
+from migrate.workbook import *
+from migrate.commands.predict import PREDICTION_COLUMN
+
+
+@click.command()
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option(
+    "--max-hours",
+    type=float,
+    required=True,
+    help="Maximum wall-clock hours per wave",
+)
+@click.option(
+    "--max-gb",
+    type=float,
+    required=False,
+    default=None,
+    help="Maximum total GB per wave",
+)
+@click.option(
+    "--lanes",
+    type=click.IntRange(min=1),
+    required=False,
+    default=1,
+    help="Number of orgs migrated at the same time within a wave",
+)
+@click.option(
+    "--repo-concurrency",
+    type=float,
+    required=False,
+    default=1,
+    help="Average number of repos in flight while an org migrates",
+)
+@click.option(
+    "--gb-per-hour",
+    type=float,
+    required=False,
+    default=10,
+    help="Throughput used for repos without a predicted duration",
+)
+@click.option(
+    "--first-wave",
+    type=int,
+    required=False,
+    default=1,
+    help="Number of the first wave to assign",
+)
+@click.option(
+    "--pin",
+    "pins",
+    multiple=True,
+    help="Pin an org to a wave, e.g. --pin my-org=2",
+)
+@click.option("--exclude", "excludes", multiple=True, help="Org to exclude")
+def plan(
+    workbook_path,
+    max_hours,
+    max_gb,
+    lanes,
+    repo_concurrency,
+    gb_per_hour,
+    first_wave,
+    pins,
+    excludes,
+):
+    """
+    Assign the orgs in 'Mapping - Org' to waves.
+    """
+
+    pinned = parse_pins(pins)
+
+    ##########################################
+    # Size each org from the inventory
+    ##########################################
+    orgs = get_sheet_df(workbook_path, "Mapping - Org")
+    inventory = get_sheet_df(workbook_path, "Inventory - Source Repos")
+
+    sizes = get_org_sizes(inventory, gb_per_hour, repo_concurrency)
+
+    # Only plan orgs that aren't (or won't be) excluded
+    orgs = orgs[(orgs["exclude"] == False) & ~orgs["source_name"].isin(excludes)]
+    orgs = orgs[["source_name"]].merge(
+        sizes, how="left", left_on="source_name", right_on="org"
+    )
+    orgs = orgs.fillna({"size (GB)": 0, "duration (hours)": 0})
+
+    ##########################################
+    # Pack the orgs into waves
+    ##########################################
+    assignments = assign_waves(orgs, max_hours, max_gb, lanes, first_wave, pinned)
+
+    for wave, wave_orgs in assignments.groupby("wave"):
+        logger.info(
+            f"* Wave {wave}: {len(wave_orgs)} orgs, "
+            f"{wave_orgs['size (GB)'].sum():.1f} GB, "
+            f"{get_makespan(wave_orgs['duration (hours)'], lanes):.1f} hours"
+        )
+
+    excluded = pd.DataFrame({"source_name": list(excludes)})
+    excluded["exclude"] = True
+    excluded["exclude_reason"] = "Excluded by planner"
+
+    ##########################################
+    # Write the plan to the workbook
+    ##########################################
+    with workbook_session(workbook_path) as workbook:
+        update_org_mapping(
+            workbook,
+            "Mapping - Org",
+            pd.concat([assignments[["source_name", "wave", "order"]], excluded]).astype(
+                {"wave": "Int64", "order": "Int64"}
+            ),
+        )
+
+    logger.info("*** Updated waves in 'Mapping - Org'")
+
+
+def parse_pins(pins):
+    """Parses --pin options like 'my-org=2' into {org: wave}"""
+
+    pinned = {}
+
+    for pin in pins:
+        org, sep, wave = pin.rpartition("=")
+        if not sep or not wave.isdigit():
+            raise click.UsageError(f"Invalid --pin '{pin}', expected ORG=WAVE")
+        pinned[org] = int(wave)
+
+    return pinned
+
+
+def get_org_sizes(inventory, gb_per_hour, repo_concurrency):
+    """
+    Returns each org's total size and estimated duration.  A repo's duration
+    is its predicted duration if there is one, otherwise its size over
+    gb_per_hour (at least one minute).
+    """
+
+    repos = pd.DataFrame(
+        {
+            "org": inventory["owner.login"],
+            # diskUsage is in KB
+            "size (GB)": pd.to_numeric(inventory["diskUsage"], errors="coerce")
+            .fillna(0)
+            .div(1024 * 1024),
+        }
+    )
+
+    estimate = (repos["size (GB)"] / gb_per_hour * 60).clip(lower=1)
+    if PREDICTION_COLUMN in inventory:
+        predicted = pd.to_numeric(inventory[PREDICTION_COLUMN], errors="coerce")
+        repos["duration (mins)"] = predicted.fillna(estimate)
+    else:
+        repos["duration (mins)"] = estimate
+
+    sizes = repos.groupby("org", as_index=False).sum()
+    sizes["duration (hours)"] = sizes["duration (mins)"] / 60 / repo_concurrency
+
+    return sizes[["org", "size (GB)", "duration (hours)"]]
+
+
+def get_makespan(durations, lanes):
+    """
+    Returns the wall-clock time of running the durations longest-first
+    across a number of lanes
+    """
+
+    finish_times = [0.0] * lanes
+
+    for duration in sorted(durations, reverse=True):
+        heapq.heapreplace(finish_times, finish_times[0] + duration)
+
+    return max(finish_times)
+
+
+def assign_waves(orgs, max_hours, max_gb, lanes, first_wave, pinned):
+    """
+    Assigns orgs to waves using first-fit decreasing bin packing, then orders
+    each wave's orgs longest-first.  Pinned orgs are placed first and always
+    stay in their wave.
+    """
+
+    waves = {}
+
+    def fits(wave, org):
+        wave_orgs = waves.get(wave, [])
+        hours = get_makespan(
+            [o["duration (hours)"] for o in wave_orgs] + [org["duration (hours)"]],
+            lanes,
+        )
+        size = sum(o["size (GB)"] for o in wave_orgs) + org["size (GB)"]
+
+        return hours <= max_hours and (max_gb is None or size <= max_gb)
+
+    records = orgs.sort_values("duration (hours)", ascending=False).to_dict(
+        orient="records"
+    )
+
+    for org in [o for o in records if o["source_name"] in pinned]:
+        waves.setdefault(pinned[org["source_name"]], []).append(org)
+
+    for org in [o for o in records if o["source_name"] not in pinned]:
+        wave = first_wave
+        while not fits(wave, org):
+            # An org that doesn't fit in an empty wave gets a wave of its own
+            if not waves.get(wave):
+                logger.info(
+                    f"*** {org['source_name']} exceeds the wave limits on its own"
+                )
+                break
+            wave += 1
+        waves.setdefault(wave, []).append(org)
+
+    assignments = []
+
+    for wave, wave_orgs in sorted(waves.items()):
+        wave_orgs.sort(key=lambda o: o["duration (hours)"], reverse=True)
+        for order, org in enumerate(wave_orgs):
+            assignments.append({**org, "wave": wave, "order": order})
+
+    return pd.DataFrame(
+        assignments,
+        columns=["source_name", "size (GB)", "duration (hours)", "wave", "order"],
+    )
@@ -0,0 +1,189 @@
+import os
+import json
+import click
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from migrate import store
+from migrate.workbook import *
+
+# Inventory columns (from `gh migrate stats`) used to predict migration time
+FEATURES = [
+    "diskUsage",
+    "pullRequests.totalCount",
+    "pullRequests.commits.totalCount",
+    "pullRequests.comments.totalCount",
+    "issues.totalCount",
+    "issues.comments.totalCount",
+    "issues.timelineItems.totalCount",
+    "releases.totalCount",
+    "commitComments.totalCount",
+]
+
+PREDICTION_COLUMN = "predicted duration (mins)"
+
+
+@click.command()
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option(
+    "--inventory",
+    "inventory_path",
+    required=False,
+    default="./logs/before-source-wave-0.csv",
+    help="Source inventory to add the predictions to",
+)
+@click.argument("output_dir", required=False, default="logs")
+def predict(workbook_path, inventory_path, output_dir):
+    """
+    Predict each repo's migration time from the timings of past waves.
+    """
+
+    ##########################################
+    # Build the training set
+    ##########################################
+    logger.info("*** Building training set from past migrations")
+    training = build_training_set(workbook_path, output_dir)
+
+    training_path = os.path.join(output_dir, "duration-training-set.csv")
+    training.to_csv(training_path, index=False)
+    logger.info(f"*** Wrote {len(training)} timed repos to {training_path}")
+
+    ##########################################
+    # Fit the model
+    ##########################################
+    model = fit_duration_model(training)
+
+    model_path = os.path.join(output_dir, "duration-model.json")
+    with open(model_path, "w") as f:
+        json.dump(model, f, indent=2)
+
+    logger.info(
+        f"*** Fit model on {model['samples']} repos "
+        f"(R²: {model['r2']:.2f}, MAE: {model['mae']:.1f} mins)"
+    )
+
+    ##########################################
+    # Add the predictions to the inventory
+    ##########################################
+    source_stats = pd.read_csv(
+        inventory_path,
+        parse_dates=["updatedAt", "pushedAt"],
+    )
+    source_stats[PREDICTION_COLUMN] = predict_durations(model, source_stats)
+    source_stats = add_risk_columns(source_stats)
+
+    with workbook_session(workbook_path) as workbook:
+        add_inventory_worksheet(workbook, "Inventory - Source Repos", source_stats)
+
+    logger.info(f"*** Added {PREDICTION_COLUMN} to 'Inventory - Source Repos'")
+
+
+def build_training_set(workbook_path, output_dir):
+    """
+    Joins the repo timings of every "Post-Timing" sheet in the workbook with
+    the repo stats from every `gh migrate stats` CSV
+    """
+
+    ############################################################
+    # Get the repo timings, keyed by source org
+    ############################################################
+    timings = get_table_dfs(workbook_path, "repo_timings_")
+    if not timings:
+        raise ValueError("No repo timings found, run `gh migrate report` first")
+
+    timings = pd.concat(timings.values(), ignore_index=True)
+    timings = timings[["org", "repo", "duration (mins)"]].dropna()
+
+    # Map the target orgs (dry-run or production) back to the source orgs
+    orgs = get_sheet_df(workbook_path, "Mapping - Org")
+    org_map = {
+        **dict(zip(orgs["dry_run_target_name"], orgs["source_name"])),
+        **dict(zip(orgs["target_name"], orgs["source_name"])),
+    }
+
+    timings["owner.login"] = timings["org"].map(org_map)
+
+    # GEI names the log files after the repos
+    timings["name"] = timings["repo"].str.replace(r"\.md$", "", regex=True)
+
+    ############################################################
+    # Get the repo stats
+    ############################################################
+    # Every wave's source stats, before and after, dry-run or production
+    store.ingest_dir(output_dir, kinds=["stats"])
+    stats = store.query(
+        "stats", ["Inventoried", "owner.login", "name"] + FEATURES, side="source"
+    )
+    if stats.empty:
+        raise ValueError(f"No source stats found in {output_dir}")
+
+    # Keep the latest stats for each repo
+    stats = stats.sort_values("Inventoried").drop_duplicates(
+        subset=["owner.login", "name"], keep="last"
+    )
+    stats = stats[["owner.login", "name"] + [f for f in FEATURES if f in stats]]
+
+    return timings.merge(stats, how="inner", on=["owner.login", "name"])
+
+
+def get_feature_matrix(df):
+    """Returns the log-scaled features, with a leading intercept column"""
+
+    features = [
+        (
+            np.log1p(pd.to_numeric(df[f], errors="coerce").fillna(0).clip(lower=0))
+            if f in df
+            else np.zeros(len(df))
+        )
+        for f in FEATURES
+    ]
+
+    return np.column_stack([np.ones(len(df))] + features)
+
+
+def fit_duration_model(training, alpha=1.0):
+    """
+    Fits a ridge regression of migration minutes on the log-scaled repo stats
+    """
+
+    if len(training) < 2:
+        raise ValueError("Need at least two timed repos to fit a model")
+
+    X = get_feature_matrix(training)
+    y = pd.to_numeric(training["duration (mins)"]).to_numpy(dtype=float)
+
+    # Don't penalize the intercept
+    penalty = alpha * np.eye(X.shape[1])
+    penalty[0, 0] = 0
+
+    coefficients = np.linalg.solve(X.T @ X + penalty, X.T @ y)
+
+    predicted = X @ coefficients
+    residuals = y - predicted
+    variance = ((y - y.mean()) ** 2).sum()
+
+    return {
+        "features": FEATURES,
+        "intercept": coefficients[0],
+        "coefficients": dict(zip(FEATURES, coefficients[1:])),
+        "samples": len(training),
+        "r2": 1 - (residuals**2).sum() / variance if variance else 0.0,
+        "mae": np.abs(residuals).mean(),
+    }
+
+
+def predict_durations(model, df):
+    """Predicts the migration minutes of each repo in df"""
+
+    coefficients = np.array(
+        [model["intercept"]] + [model["coefficients"][f] for f in FEATURES]
+    )
+
+    return (get_feature_matrix(df) @ coefficients).clip(min=0).round(1)
@@ -0,0 +1,262 @@
+import os
+import asyncio
+import click
+import pandas as pd
+from githubkit import GitHub
+from githubkit.exception import GraphQLFailed
+from loguru import logger
+
+from migrate.cache import cache_get_many, cache_put_many
+from migrate.commands.apply import make_pacer
+from migrate.commands.scripts import get_reclaim_mappings
+from migrate.commands.stats import auto_retry_handler
+
+# The mannequin's contributions are reattributed once the user accepts
+INVITE_MUTATION = (
+    "createAttributionInvitation(input: "
+    "{{ownerId: $org, sourceId: $mannequin{i}, targetId: $user{i}}}) "
+    "{{ clientMutationId }}"
+)
+
+# EMU only: the contributions are reattributed straight away
+REATTRIBUTE_MUTATION = (
+    "reattributeMannequinToUser(input: "
+    "{{orgId: $org, sourceId: $mannequin{i}, targetId: $user{i}}}) "
+    "{{ clientMutationId }}"
+)
+
+
+@click.command()
+@click.option("--pat", "pat", required=True)
+@click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option(
+    "--skip-invitation",
+    is_flag=True,
+    help="Reattribute immediately, without inviting the users (EMU only)",
+)
+@click.option(
+    "--max-concurrency",
+    type=int,
+    default=10,
+    help="Maximum number of API requests in flight",
+)
+@click.option(
+    "--rate",
+    type=float,
+    default=5,
+    help="Maximum number of API requests started per second",
+)
+@click.option(
+    "--batch-size",
+    type=int,
+    default=25,
+    help="Number of mannequins reclaimed per GraphQL request",
+)
+@click.argument("output_dir", required=False, default="logs")
+def reclaim(
+    pat,
+    dry_run,
+    wave,
+    workbook_path,
+    skip_invitation,
+    max_concurrency,
+    rate,
+    batch_size,
+    output_dir,
+):
+    """
+    Reclaim a wave's mapped mannequins directly through the GitHub API.
+    """
+
+    if dry_run:
+        output_dir = os.path.join(output_dir, "dry-run")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    mappings = list(get_reclaim_mappings(workbook_path, dry_run, wave))
+
+    logger.info(
+        f"* Reclaiming {sum(len(m) for _, m in mappings)} mannequins for wave {wave}"
+    )
+
+    results = asyncio.run(
+        reclaim_mannequins(
+            pat, mappings, skip_invitation, max_concurrency, rate, batch_size
+        )
+    )
+
+    results_path = os.path.join(output_dir, f"reclaim-mannequins-wave-{wave}.csv")
+    results.to_csv(results_path, index=False)
+
+    failed = results[results["error"] != ""]
+    logger.info(
+        f"* Reclaimed {len(results) - len(failed)}/{len(results)} mannequins, "
+        f"see {results_path}"
+    )
+
+
+async def reclaim_mannequins(
+    pat, mappings, skip_invitation, max_concurrency, rate, batch_size
+):
+    """
+    Reclaims the mannequins of each org, batch_size per aliased GraphQL
+    mutation, with up to max_concurrency requests in flight and no more than
+    rate requests started per second
+    """
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pace = make_pacer(rate)
+
+    mutation = REATTRIBUTE_MUTATION if skip_invitation else INVITE_MUTATION
+
+    results = []
+
+    async with GitHub(pat, auto_retry=auto_retry_handler) as github:
+        for target_org, org_mappings in mappings:
+            logger.info(f"** Reclaiming {len(org_mappings)} mannequins in {target_org}")
+
+            org_id, user_ids = await get_node_ids(
+                github, target_org, org_mappings["target-user"].unique().tolist()
+            )
+
+            records = org_mappings.to_dict(orient="records")
+            for record in records:
+                record["target_org"] = target_org
+                record["target-user-id"] = user_ids.get(record["target-user"])
+
+            batches = [
+                records[start : start + batch_size]
+                for start in range(0, len(records), batch_size)
+            ]
+
+            for batch_results in await asyncio.gather(
+                *[
+                    reclaim_batch(github, semaphore, pace, mutation, org_id, batch)
+                    for batch in batches
+                ]
+            ):
+                results.extend(batch_results)
+
+    return pd.DataFrame(
+        results,
+        columns=[
+            "target_org",
+            "mannequin-user",
+            "mannequin-id",
+            "target-user",
+            "error",
+        ],
+    )
+
+
+async def get_node_ids(github, org, logins, batch_size=100):
+    """
+    Returns the org's node ID and {login: node ID} for the users, looking up
+    batch_size users per aliased GraphQL request.  Users cached by an earlier
+    target snapshot or reclaim aren't looked up again.
+    """
+
+    response = await github.async_graphql(
+        "query ($org: String!) { organization(login: $org) { id } }",
+        variables={"org": org},
+    )
+    org_id = response["organization"]["id"]
+
+    cached = cache_get_many("user", logins)
+    user_ids = {login: user["node_id"] for login, user in cached.items()}
+
+    logins = [login for login in logins if login not in cached]
+    fetched = {}
+
+    for start in range(0, len(logins), batch_size):
+        batch = logins[start : start + batch_size]
+
+        params = ", ".join(f"$login{i}: String!" for i in range(len(batch)))
+        aliases = "\n".join(
+            f"  user{i}: user(login: $login{i}) {{ id }}" for i in range(len(batch))
+        )
+        query = f"query ({params}) {{\n{aliases}\n}}"
+        variables = {f"login{i}": login for i, login in enumerate(batch)}
+
+        try:
+            data = await github.async_graphql(query, variables=variables)
+        except GraphQLFailed as e:
+            # Users that can't be found are reported as errors, keep the rest
+            for error in e.response.errors:
+                logger.info(f"Error: {error.message}")
+            data = e.response.data or {}
+
+        for i, login in enumerate(batch):
+            user = data.get(f"user{i}")
+            if user:
+                fetched[login] = {"login": login, "node_id": user["id"]}
+
+    cache_put_many("user", fetched)
+    user_ids |= {login: user["node_id"] for login, user in fetched.items()}
+
+    return org_id, user_ids
+
+
+async def reclaim_batch(github, semaphore, pace, mutation, org_id, records):
+    """Reclaims a batch of mannequins in one request, returning their results"""
+
+    results = [
+        {
+            k: record[k]
+            for k in ["target_org", "mannequin-user", "mannequin-id", "target-user"]
+        }
+        | {"error": "" if record["target-user-id"] else "target-user not found"}
+        for record in records
+    ]
+
+    # Only send the mannequins whose target user was found
+    batch = [(i, r) for i, r in enumerate(records) if r["target-user-id"]]
+    if not batch:
+        return results
+
+    params = ", ".join(
+        ["$org: ID!"] + [f"$mannequin{i}: ID!, $user{i}: ID!" for i, _ in batch]
+    )
+    aliases = "\n".join(f"  reclaim{i}: {mutation.format(i=i)}" for i, _ in batch)
+    query = f"mutation ({params}) {{\n{aliases}\n}}"
+
+    variables = {"org": org_id}
+    for i, record in batch:
+        variables[f"mannequin{i}"] = record["mannequin-id"]
+        variables[f"user{i}"] = record["target-user-id"]
+
+    async with semaphore:
+        await pace()
+
+        try:
+            await github.async_graphql(query, variables=variables)
+        except GraphQLFailed as e:
+            # Errors carry the alias of the mutation that failed
+            for error in e.response.errors:
+                path = getattr(error, "path", None) or []
+                alias = str(path[0]) if path else ""
+                if alias.startswith("reclaim"):
+                    results[int(alias[len("reclaim") :])]["error"] = error.message
+                else:
+                    for i, _ in batch:
+                        results[i]["error"] = error.message
+        except Exception as e:
+            for i, _ in batch:
+                results[i]["error"] = str(e)
+
+    for result in results:
+        if result["error"]:
+            logger.info(
+                f"*** Reclaiming {result['mannequin-user']} as "
+                f"{result['target-user']} failed: {result['error']}"
+            )
+
+    return results
@@ -1,11 +1,26 @@
 import os
+import mmap
+import random
 import click
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from loguru import logger
 
+from migrate import store
+from migrate.profiling import phase
 from migrate.workbook import *
 
+# GEI repo log lines marking the start of each migration phase.  Markers are
+# matched case-insensitively against INFO lines only, and the first matching
+# line is the transition.
+MIGRATION_PHASES = {
+    "export": ["exporting", "export started", "starting export"],
+    "upload": ["uploading", "archive upload"],
+    "import": ["importing", "import started", "starting import"],
+    "rewrite": ["rewriting", "metadata rewrite", "updating metadata"],
+}
+
 
 @click.command()
 @click.option(
@@ -22,8 +37,42 @@ from migrate.workbook import *
     required=False,
     default="report/InfoMagnus - Migration Workbook.xlsx",
 )
+@click.option(
+    "--workers",
+    type=int,
+    required=False,
+    default=None,
+    help="Number of processes used to parse the GEI logs (default: CPU count)",
+)
+@click.option(
+    "--max-warnings",
+    type=int,
+    required=False,
+    default=None,
+    help="Maximum number of WARN lines kept per repo (all are still counted)",
+)
+@click.option(
+    "--sample-warnings",
+    is_flag=True,
+    help="Keep a random sample of WARN lines, instead of the first ones, when capped",
+)
+@click.option(
+    "--sidecar",
+    type=click.Choice(["csv", "parquet"]),
+    help="Write tables too long for a sheet to compressed files, instead of splitting them",
+)
 @click.argument("output_dir", type=click.STRING, required=False, default="logs")
-def report(final, dry_run, wave, workbook_path, output_dir):
+def report(
+    final,
+    dry_run,
+    wave,
+    workbook_path,
+    workers,
+    max_warnings,
+    sample_warnings,
+    sidecar,
+    output_dir,
+):
 
     if dry_run:
         output_dir = os.path.join(output_dir, "dry-run")
@@ -40,92 +89,135 @@ def report(final, dry_run, wave, workbook_path, output_dir):
     else:
         target_column = "target_name"
 
-    wb = get_workbook(workbook_path)
-    orgs = get_orgs_for_wave(target_column, wave, workbook_path)
+    with workbook_session(workbook_path, sidecar) as wb:
+        orgs = get_orgs_for_wave(target_column, wave, workbook_path)
+
+        # We only need to parse the migration logs if this is not the final run
+        if not final:
+            ############################################################
+            # Parse the GEI logs and generate the GEI migration reports
+            ############################################################
+            logger.info(f"\n* Generating GEI migration reports for wave: {wave}")
+            (org_timings, repo_timings, repo_results) = generate_gei_reports(
+                orgs, output_dir, workers, max_warnings, sample_warnings
+            )
+
+            # Keep the parsed logs, for queries across waves
+            for kind, df in [
+                ("org-timings", org_timings),
+                ("repo-timings", repo_timings),
+                ("migration-logs", repo_results),
+            ]:
+                store.put_df(
+                    kind, df, f"report:{ws_suffix}", wave=wave, dry_run=dry_run
+                )
+
+            repo_sizes = get_repo_sizes(
+                os.path.join(output_dir, f"before-source-wave-{wave}.csv"),
+                get_orgs_for_wave_df(wave, workbook_path),
+                target_column,
+            )
+            phase_throughput = generate_phase_throughput(
+                org_timings, repo_timings, repo_sizes
+            )
+            add_post_migration_timings_report(
+                dry_run,
+                wave,
+                wb,
+                f"Post-Timing ({ws_suffix})",
+                org_timings,
+                repo_timings,
+                phase_throughput,
+            )
+            add_post_migration_logs_report(
+                dry_run,
+                wave,
+                wb,
+                f"Post-Logs ({ws_suffix})",
+                repo_results,
+            )
 
-    # We only need to parse the migration logs if this is not the final run
-    if not final:
         ############################################################
-        # Parse the GEI logs and generate the GEI migration reports
+        # Parse the `gh migrate stats` results and report any
+        # differences between the source and target orgs
         ############################################################
-        logger.info(f"\n* Generating GEI migration reports for wave: {wave}")
-        (org_timings, repo_timings, repo_results) = generate_gei_reports(
-            orgs, output_dir
+        logger.info(f"\n* Generating stats report for wave: {wave}")
+        stats = generate_stats_report(final, wb, wave, output_dir)
+        add_post_migration_stats_report(
+            dry_run, wave, wb, f"Post-Stats ({ws_suffix})", stats
         )
-        add_post_migration_timings_report(
-            dry_run,
-            wave,
-            wb,
-            f"Post-Timing ({ws_suffix})",
-            org_timings,
-            repo_timings,
+
+        ############################################################
+        # Generate stats report
+        ############################################################
+        if dry_run:
+            output_dir = os.path.join("snapshots", "dry-run")
+        else:
+            output_dir = os.path.join("snapshots")
+
+        orgs = get_orgs_for_wave_df(wave, workbook_path)
+        (team_repos, team_users, teams, repos, users) = generate_snapshots_report(
+            final, orgs, wb, wave, output_dir, dry_run
         )
-        add_post_migration_logs_report(
+
+        add_post_migration_snaps_report(
             dry_run,
             wave,
             wb,
-            f"Post-Logs ({ws_suffix})",
-            repo_results,
+            f"Post-Snaps ({ws_suffix})",
+            repos,
+            users,
+            teams,
+            team_users,
+            team_repos,
         )
 
-    ############################################################
-    # Parse the `gh migrate stats` results and report any
-    # differences between the source and target orgs
-    ############################################################
-    logger.info(f"\n* Generating stats report for wave: {wave}")
-    stats = generate_stats_report(final, wb, wave, output_dir)
-    add_post_migration_stats_report(
-        dry_run, wave, wb, f"Post-Stats ({ws_suffix})", stats
-    )
 
-    ############################################################
-    # Generate stats report
-    ############################################################
-    if dry_run:
-        output_dir = os.path.join("snapshots", "dry-run")
-    else:
-        output_dir = os.path.join("snapshots")
-
-    orgs = get_orgs_for_wave_df(wave, workbook_path)
-    (team_repos, team_users, teams, repos, users) = generate_snapshots_report(
-        final, orgs, wb, wave, output_dir, dry_run
-    )
-
-    add_post_migration_snaps_report(
-        dry_run,
-        wave,
-        wb,
-        f"Post-Snaps ({ws_suffix})",
-        repos,
-        users,
-        teams,
-        team_users,
-        team_repos,
-    )
-
-
-def generate_gei_reports(orgs, logs_dir):
+@phase("parse logs")
+def generate_gei_reports(
+    orgs, logs_dir, workers=None, max_warnings=None, sample_warnings=False
+):
 
     org_timings = []
     repo_timings = []
     repo_results = []
 
-    for org in orgs:
-        logger.info(f"\n** Processing org {org}")
-        (start_time, end_time, duration, repo_timing, repo_result) = (
-            parse_migration_logs(org, logs_dir)
-        )
-
-        org_timings.append(
-            {
-                "org": org,
-                "start_time": start_time,
-                "end_time": end_time,
-                "duration (mins)": duration,
-            }
-        )
-        repo_timings.append(repo_timing)
-        repo_results.append(repo_result)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Queue the repo logs of *every* org before collecting any results,
+        # so the pool stays busy across org boundaries
+        pending = [
+            (
+                org,
+                submit_repo_logs(
+                    executor, org, logs_dir, max_warnings, sample_warnings
+                ),
+            )
+            for org in orgs
+        ]
+
+        for org, futures in pending:
+            logger.info(f"\n** Processing org {org}")
+
+            # Collect the repository migration logs
+            (repo_timing, repo_result) = collect_repo_logs(
+                future.result() for future in futures
+            )
+
+            # Parse the organization migration log
+            (start_time, end_time, duration) = get_org_timing(
+                f"{logs_dir}/{org}", repo_timing
+            )
+
+            org_timings.append(
+                {
+                    "org": org,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "duration (mins)": duration,
+                }
+            )
+            repo_timings.append(repo_timing)
+            repo_results.append(repo_result)
 
     org_timings_df = pd.DataFrame(org_timings)
     repo_timings_df = pd.concat(repo_timings)
@@ -134,140 +226,249 @@ def generate_gei_reports(orgs, logs_dir):
     return (org_timings_df, repo_timings_df, repo_results_df)
 
 
-def parse_migration_logs(org, output_dir):
-    output_dir = f"{output_dir}/{org}"
+def parse_log_time(line):
+    """Parses the timestamp from a log line like '[2024-04-12T01:25:50Z] ...'"""
 
-    # Parse the organization migration log
-    (start_time, end_time, duration) = parse_org_log(output_dir)
+    # Remove '[' and ']'
+    log_time = line.split(" ")[0][1:-1]
 
-    # Parse the repository migration logs
-    (success_repo_timing, success_repo_results) = parse_repo_logs(
-        org, "success", f"./{output_dir}"
-    )
-    (fail_repo_timing, fail_repo_results) = parse_repo_logs(
-        org, "failure", f"./{output_dir}"
-    )
+    return datetime.datetime.strptime(log_time, "%Y-%m-%dT%H:%M:%SZ")
 
-    repo_timing = pd.concat([success_repo_timing, fail_repo_timing])
-    repo_results = pd.concat([success_repo_results, fail_repo_results])
 
-    return (start_time, end_time, duration, repo_timing, repo_results)
+def iter_log_lines(log_path):
+    """
+    Yields the lines starting with '[' from a log file.  The file is read
+    through a memory map, so even very large logs use bounded memory.
+    """
+
+    with open(log_path, "rb") as f:
+        # Empty files can't be memory-mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                if line.startswith(b"["):
+                    yield line.decode("utf-8", errors="replace")
 
 
 def parse_org_log(output_dir):
 
     org_log = os.path.join("./", output_dir, "README.md")
 
-    # Open file and find lines starting with '['
-    with open(org_log, "r") as f:
-        lines = [line for line in f.readlines() if line.startswith("[")]
-
-    # Get line containing "Organization migrated started"
-    start_line = [line for line in lines if "Organization migration started" in line][0]
-    end_line = [line for line in lines if "Organization migration completed" in line][0]
+    start_line = None
+    end_line = None
 
-    # Parse start time from start_line
-    start_time = start_line.split(" ")[0]
-    end_time = end_line.split(" ")[0]
+    # Stream the file, stopping as soon as both lines are found
+    for line in iter_log_lines(org_log):
+        if start_line is None and "Organization migration started" in line:
+            start_line = line
+        elif end_line is None and "Organization migration completed" in line:
+            end_line = line
 
-    # Remove '[' and ']'
-    start_time = start_time[1:-1]
-    end_time = end_time[1:-1]
+        if start_line is not None and end_line is not None:
+            break
 
-    # start_time contains a string like "2024-04-12T01:25:50Z"
+    if start_line is None or end_line is None:
+        raise ValueError(f"Could not find org migration start/end in {org_log}")
 
-    start_time = datetime.datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%SZ")
-    end_time = datetime.datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%SZ")
+    start_time = parse_log_time(start_line)
+    end_time = parse_log_time(end_line)
 
     return (start_time, end_time, int((end_time - start_time).total_seconds() / 60))
 
 
-def parse_repo_logs(org, type, output_dir):
+def get_org_timing(output_dir, repo_timing):
+    """
+    Returns the org migration's start, end and duration from its README.md,
+    or from its earliest and latest repo migrations when there's no README.md
+    (as with `gh migrate get --api`)
+    """
+
+    if os.path.exists(os.path.join("./", output_dir, "README.md")):
+        return parse_org_log(output_dir)
+
+    logger.warning(
+        f"*** No README.md in {output_dir}, taking the org migration's timing "
+        "from its repo logs"
+    )
+
+    if repo_timing.empty:
+        return (None, None, None)
+
+    start_time = repo_timing["start_time"].min()
+    end_time = repo_timing["end_time"].max()
+
+    return (start_time, end_time, int((end_time - start_time).total_seconds() / 60))
 
-    timing = []
-    results = []
+
+def list_repo_logs(type, output_dir):
+    """Returns the paths of all repo migration logs of a given type"""
 
     output_dir = f"{output_dir}/{type}"
 
     # Return if output_dir doesn't exist
     if not os.path.exists(output_dir):
-        return pd.DataFrame(timing), pd.DataFrame(results)
+        return []
 
-    # Get all the directories in the output_dir
-    repos = [repo for repo in os.listdir(output_dir)]
+    return [os.path.join(output_dir, repo_log) for repo_log in os.listdir(output_dir)]
 
-    for repo_log in repos:
-        # Open file and find lines starting with '['
-        with open(f"{output_dir}/{repo_log}", "r") as f:
-            lines = [line for line in f.readlines() if line.startswith("[")]
 
-        ############################################################
-        # Get repo migration timing
-        ############################################################
+def submit_repo_logs(
+    executor, org, output_dir, max_warnings=None, sample_warnings=False
+):
+    """Queues all of an org's success and failure repo logs on the executor"""
 
-        # We should *always* have a start line
-        start_line = [line for line in lines if "Migration started" in line]
-        assert len(start_line) == 1
-        start_line = start_line[0]
+    output_dir = f"./{output_dir}/{org}"
 
-        if type == "success":
-            end_line = [line for line in lines if "Migration complete" in line][0]
-        elif type == "failure":
-            end_line = [line for line in lines if "Migration failed" in line][0]
+    return [
+        executor.submit(
+            scan_repo_log, org, type, log_path, max_warnings, sample_warnings
+        )
+        for type in ["success", "failure"]
+        for log_path in list_repo_logs(type, output_dir)
+    ]
 
-        # Parse start time from start_line
-        start_time = start_line.split(" ")[0]
-        end_time = end_line.split(" ")[0]
 
-        # Remove '[' and ']'
-        start_time = start_time[1:-1]
-        end_time = end_time[1:-1]
+def scan_repo_log(org, type, log_path, max_warnings=None, sample_warnings=False):
+    """
+    Scans a single repo migration log in one pass, returning the repo's timing
+    and a list of its warnings and errors.
 
-        # start_time contains a string like "2024-04-12T01:25:50Z"
+    If max_warnings is set, only that many WARN lines are kept (the first ones,
+    or a uniform random sample if sample_warnings is set), but all of them are
+    counted.
+    """
 
-        start_time = datetime.datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%SZ")
-        end_time = datetime.datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%SZ")
+    repo_log = os.path.basename(log_path)
+
+    end_marker = "Migration complete" if type == "success" else "Migration failed"
+
+    start_lines = []
+    end_line = None
+    transitions = {}
+    warnings = []
+    warning_count = 0
+    errors = []
+
+    # Seed with the repo name so sampled reports are reproducible
+    rng = random.Random(repo_log)
+
+    for line in iter_log_lines(log_path):
+        if "Migration started" in line:
+            start_lines.append(line)
+        if end_line is None and end_marker in line:
+            end_line = line
+        if len(transitions) < len(MIGRATION_PHASES) and " INFO " in line:
+            current_phase = match_phase(line, transitions)
+            if current_phase is not None:
+                transitions[current_phase] = parse_log_time(line)
+        if "WARN" in line:
+            warning_count += 1
+            if max_warnings is None or len(warnings) < max_warnings:
+                warnings.append(line.strip())
+            elif sample_warnings:
+                # Reservoir sampling
+                i = rng.randrange(warning_count)
+                if i < max_warnings:
+                    warnings[i] = line.strip()
+        if "ERROR" in line:
+            errors.append(line.strip())
 
-        logger.info(f"Repo: {repo_log}")
+    ############################################################
+    # Get repo migration timing
+    ############################################################
+
+    # We should *always* have a start line
+    assert len(start_lines) == 1, f"Expected one start line in {log_path}"
+
+    if end_line is None:
+        raise ValueError(f'Could not find "{end_marker}" in {log_path}')
+
+    start_time = parse_log_time(start_lines[0])
+    end_time = parse_log_time(end_line)
 
-        timing.append(
-            {
-                "org": org,
-                "repo": repo_log,
-                "start_time": start_time,
-                "end_time": end_time,
-                "duration (mins)": int((end_time - start_time).total_seconds() / 60),
-            }
+    timing = {
+        "org": org,
+        "repo": repo_log,
+        "start_time": start_time,
+        "end_time": end_time,
+        "duration (mins)": int((end_time - start_time).total_seconds() / 60),
+        **get_phase_durations(transitions, end_time),
+        "warnings": warning_count,
+        "errors": len(errors),
+    }
+
+    ############################################################
+    # Get warnings or errors
+    ############################################################
+
+    # Sampled warnings are out of order, the timestamp prefix puts them back
+    if sample_warnings:
+        warnings.sort()
+
+    # Let the reader know how many warnings were left out
+    if warning_count > len(warnings):
+        warnings.append(
+            f"... {warning_count - len(warnings)} more warnings not shown "
+            f"({warning_count} total)"
         )
 
-        ############################################################
-        # Get warnings or errors
-        ############################################################
+    results = [
+        {"org": org, "repo": repo_log, "type": "WARN", "message": warning}
+        for warning in warnings
+    ] + [
+        {"org": org, "repo": repo_log, "type": "ERROR", "message": error}
+        for error in errors
+    ]
 
-        warnings = [line for line in lines if "WARN" in line]
-        errors = [line for line in lines if "ERROR" in line]
-
-        if len(warnings) != 0:
-            for warning in warnings:
-                results.append(
-                    {
-                        "org": org,
-                        "repo": repo_log,
-                        "type": "WARN",
-                        "message": warning.strip(),
-                    }
-                )
+    return (timing, results)
+
+
+def match_phase(line, seen):
+    """Returns the (not yet seen) migration phase a log line starts, if any"""
+
+    line = line.lower()
+
+    for phase_name, markers in MIGRATION_PHASES.items():
+        if phase_name in seen:
+            continue
+        if any(marker in line for marker in markers):
+            return phase_name
+
+    return None
+
+
+def get_phase_durations(transitions, end_time):
+    """
+    Converts phase transition times into per-phase durations.  Each phase
+    lasts until the next transition, and the last one until the migration ends.
+    """
+
+    durations = {f"{phase_name} (mins)": None for phase_name in MIGRATION_PHASES}
+
+    ordered = sorted(transitions.items(), key=lambda item: item[1])
+    next_times = [time for _, time in ordered[1:]] + [end_time]
+
+    for (phase_name, time), next_time in zip(ordered, next_times):
+        durations[f"{phase_name} (mins)"] = round(
+            (next_time - time).total_seconds() / 60, 1
+        )
+
+    return durations
 
-        if len(errors) != 0:
-            for error in errors:
-                results.append(
-                    {
-                        "org": org,
-                        "repo": repo_log,
-                        "type": "ERROR",
-                        "message": error.strip(),
-                    }
-                )
+
+def collect_repo_logs(scans):
+    """Builds the timing and results dataframes from scanned repo logs"""
+
+    timing = []
+    results = []
+
+    for repo_timing, repo_results in scans:
+        logger.info(f"Repo: {repo_timing['repo']}")
+
+        timing.append(repo_timing)
+        results.extend(repo_results)
 
     # Write timing_results to csv
     timing_df = pd.DataFrame(timing)
@@ -278,6 +479,88 @@ def parse_repo_logs(org, type, output_dir):
     return (timing_df, results_df)
 
 
+def get_repo_sizes(stats_path, orgs, target_column):
+    """
+    Returns the size (in GB) of each repo from a `gh migrate stats` file,
+    keyed by the target org and repo name used in the GEI logs
+    """
+
+    if not os.path.exists(stats_path):
+        logger.info(f"*** No stats found at {stats_path}, skipping repo sizes")
+        return pd.DataFrame(columns=["org", "repo", "size (GB)"])
+
+    stats = pd.read_csv(stats_path, usecols=["owner.login", "name", "diskUsage"])
+
+    # Map the source orgs to the target orgs
+    org_map = dict(zip(orgs["source_name"], orgs[target_column]))
+
+    return pd.DataFrame(
+        {
+            "org": stats["owner.login"].map(org_map),
+            "repo": stats["name"],
+            # diskUsage is in KB
+            "size (GB)": pd.to_numeric(stats["diskUsage"], errors="coerce")
+            / (1024 * 1024),
+        }
+    ).dropna(subset=["org"])
+
+
+def generate_phase_throughput(org_timings, repo_timings, repo_sizes):
+    """
+    Summarizes each org's throughput: repos/hour and GB/hour over the org's
+    wall-clock time, the average number of repos in flight, and the GB/hour
+    of each migration phase (per repo in flight)
+    """
+
+    if repo_timings.empty:
+        return pd.DataFrame()
+
+    repos = repo_timings.copy()
+
+    # GEI names the log files after the repos
+    repos["repo_name"] = repos["repo"].str.replace(r"\.md$", "", regex=True)
+    repos = repos.merge(
+        repo_sizes.rename(columns={"repo": "repo_name"}),
+        how="left",
+        on=["org", "repo_name"],
+    )
+
+    throughput = []
+
+    for _, org in org_timings.iterrows():
+        org_repos = repos[repos["org"] == org["org"]]
+        hours = (org["end_time"] - org["start_time"]).total_seconds() / 3600
+        size = org_repos["size (GB)"].sum()
+
+        row = {
+            "org": org["org"],
+            "repos": len(org_repos),
+            "size (GB)": round(size, 2),
+            "repos/hour": round(len(org_repos) / hours, 2) if hours else None,
+            "GB/hour": round(size / hours, 2) if hours else None,
+            "avg repos in flight": (
+                round(org_repos["duration (mins)"].sum() / 60 / hours, 2)
+                if hours
+                else None
+            ),
+        }
+
+        for phase_name in MIGRATION_PHASES:
+            phase_hours = org_repos[f"{phase_name} (mins)"].sum() / 60
+            phase_size = org_repos.loc[
+                org_repos[f"{phase_name} (mins)"].notna(), "size (GB)"
+            ].sum()
+            row[f"{phase_name} (hours)"] = round(phase_hours, 2)
+            row[f"{phase_name} GB/hour"] = (
+                round(phase_size / phase_hours, 2) if phase_hours else None
+            )
+
+        throughput.append(row)
+
+    return pd.DataFrame(throughput)
+
+
+@phase("diff")
 def generate_snapshots_report(final, orgs, workbook, wave, output_dir, dry_run):
 
     types = ["team-repos", "team-users", "teams", "repos", "users"]
@@ -363,6 +646,7 @@ def generate_snapshots_report(final, orgs, workbook, wave, output_dir, dry_run):
     )
 
 
+@phase("diff")
 def generate_stats_report(final, workbook, wave, output):
 
     if final:
@@ -1,12 +1,12 @@
 import glob
 import os
 import click
-from jinja2 import Environment, FileSystemLoader
 import pandas as pd
 from loguru import logger
 
 from migrate.workbook import *
 from migrate.version import checkpoint_file
+from migrate.cache import cache_get_many, cache_put_many
 
 
 @click.group()
@@ -18,6 +18,9 @@ def render_template(template_name, output_name, **kwargs):
     """
     Render a jinja2 template and write it to a file.
     """
+    # Only imported when rendering, not by the commands that use the plans
+    from jinja2 import Environment, FileSystemLoader
+
     env = Environment(loader=FileSystemLoader("."))
 
     # TODO: Figure out why the first line doesn't work
@@ -94,7 +97,19 @@ def unarchive(workbook_path, dry_run, wave):
 )
 @click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
 @click.option("--wave", type=int, help="Wave number", required=True)
-def migration(workbook_path, final, dry_run, wave):
+@click.option(
+    "--orchestrate",
+    type=click.Choice(["org", "repo"]),
+    default=None,
+    help="Migrate with `gh migrate execute` instead of serial `gh gei migrate-org`",
+)
+@click.option(
+    "--max-jobs",
+    type=int,
+    default=10,
+    help="Maximum number of migrations in flight (with --orchestrate)",
+)
+def migration(workbook_path, final, dry_run, wave, orchestrate, max_jobs):
     """
     Generate the migration script.
     """
@@ -163,9 +178,94 @@ def migration(workbook_path, final, dry_run, wave):
         orgs=wave_orgs,
         dry_run=dry_run,
         wave=wave,
+        orchestrate=orchestrate,
+        max_jobs=max_jobs,
+    )
+
+
+###############################
+# Reclaim mannequins script
+###############################
+@scripts.command()
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "--skip-invitation",
+    is_flag=True,
+    help="Reattribute immediately, without inviting the users (EMU only)",
+)
+def reclaim(workbook_path, dry_run, wave, skip_invitation):
+    """
+    Generate the bulk mannequin reclaim CSVs and script.
+    """
+
+    if dry_run:
+        logger.info(f"\n* Generating dry-run reclaim script for wave: {wave}")
+        prefix = "DRY-RUN"
+    else:
+        logger.info(f"\n* Generating production reclaim script for wave: {wave}")
+        prefix = "PRODUCTION"
+
+    orgs = []
+
+    for target_org, mappings in get_reclaim_mappings(workbook_path, dry_run, wave):
+        csv_file = f"{prefix}-wave-{int(wave)}-reclaim-mannequins-{target_org}.csv"
+
+        # The columns `gh gei reclaim-mannequin --csv` expects
+        mappings.to_csv(os.path.join("scripts", csv_file), index=False)
+        logger.info(f"** {len(mappings)} mannequins to reclaim in {target_org}")
+
+        orgs.append({"target_org": target_org, "csv": f"scripts/{csv_file}"})
+
+    render_template(
+        "reclaim-mannequins.sh.j2",
+        f"{prefix}-wave-{int(wave)}-reclaim-mannequins.sh",
+        orgs=orgs,
+        skip_invitation=skip_invitation,
     )
 
 
+def get_reclaim_mappings(workbook_path, dry_run, wave):
+    """
+    Yields each of a wave's target orgs with its mapped mannequins, from
+    "Mapping - User"
+    """
+
+    if dry_run:
+        target_column = "dry_run_target_name"
+    else:
+        target_column = "target_name"
+
+    orgs = get_orgs_for_wave_df(wave, workbook_path)
+
+    mannequins_df = get_mannequin_df(workbook_path)
+
+    # `manns` records the target org, hand-made mappings the source org
+    if "target_org" not in mannequins_df:
+        target_orgs = dict(zip(orgs["source_name"], orgs[target_column]))
+        mannequins_df = mannequins_df.assign(
+            target_org=mannequins_df["source_org"].map(target_orgs)
+        )
+
+    # Users still waiting for a target-user are left for a later run
+    target_users = mannequins_df["target-user"].fillna("").astype(str).str.strip()
+    mapped = mannequins_df[(target_users != "") & mannequins_df["mannequin-id"].notna()]
+
+    for target_org in orgs[target_column].tolist():
+        mappings = mapped[mapped["target_org"] == target_org]
+        mappings = mappings[["mannequin-user", "mannequin-id", "target-user"]]
+
+        if not mappings.empty:
+            yield target_org, mappings.drop_duplicates("mannequin-id")
+
+
 ##############################################################################
 # Post-migration scripts
 ##############################################################################
@@ -179,98 +279,188 @@ def migration(workbook_path, final, dry_run, wave):
 )
 @click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
 @click.option("--wave", type=int, help="Wave number", required=True)
-def post_migration(workbook_path, dry_run, wave):
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Emit every action, even those the after-target snapshots show are done",
+)
+def post_migration(workbook_path, dry_run, wave, full):
     logger.info("*** Generating post-migration scripts")
 
     if dry_run:
         logger.info(f"* Generating dry-run post-migration script for wave: {wave}")
-        orgs = get_orgs_for_wave_df(wave, workbook_path)
         prefix = "DRY-RUN"
-        snapshots_dir = os.path.join("snapshots", "dry-run")
     else:
         logger.info(f"* Generating production post-migration script for wave: {wave}")
-        orgs = get_orgs_for_wave_df(wave, workbook_path)
         prefix = "PRODUCTION"
-        snapshots_dir = "snapshots"
 
     ###############################
     # Create post-migration scripts
     ###############################
-
-    # Get the orgs for this wave
-    wave_orgs = orgs[orgs["wave"] == wave].to_dict(orient="records")
-
-    for org in wave_orgs:
-        source_org = org["source_name"]
-        target_org = org["target_name"]
+    for plan in get_post_migration_plan(workbook_path, dry_run, wave, full):
+        target_org = plan["target_org"]
 
         ###############################
         # Create teams
         ###############################
-        teams_dir = os.path.join(snapshots_dir, f"before-source-{source_org}-teams.csv")
-
-        teams_df = pd.read_csv(teams_dir)
-
         output_file = f"{prefix}-wave-{int(wave)}-create-teams-{target_org}.sh"
 
         render_template(
             "create-teams-for-org.sh.j2",
             output_file,
-            teams=teams_df.to_dict(orient="records"),
+            teams=plan["teams"].to_dict(orient="records"),
             target_org=target_org,
         )
 
         ###############################
         # Update team permissions
         ###############################
-        team_repos_dir = os.path.join(
-            snapshots_dir, f"before-source-{source_org}-team-repos.csv"
-        )
-
-        team_repos_df = pd.read_csv(team_repos_dir)
-
         output_file = f"{prefix}-wave-{int(wave)}-update-team-perms-{target_org}.sh"
 
         render_template(
             "update-team-perms.sh.j2",
             output_file,
-            repos=team_repos_df.to_dict(orient="records"),
+            repos=plan["team_repos"].to_dict(orient="records"),
             target_org=target_org,
         )
 
         ###############################
         # Update repo visibility
         ###############################
-        repos_dir = os.path.join(snapshots_dir, f"before-source-{source_org}-repos.csv")
-
-        repos_df = pd.read_csv(repos_dir)
-
         output_file = (
             f"{prefix}-wave-{int(wave)}-update-repo-visibility-{target_org}.sh"
         )
 
-        # We only need the name and visibility columns
-        repos_df = repos_df[["name", "visibility"]]
-
         render_template(
             "update-repo-visibility.sh.j2",
             output_file,
-            repos=repos_df.to_dict(orient="records"),
+            repos=plan["repos"].to_dict(orient="records"),
             target_org=target_org,
         )
 
         ###############################
         # Add users to teams
         ###############################
+        output_file = f"{prefix}-wave-{int(wave)}-add-users-to-teams-{target_org}.sh"
+
+        render_template(
+            "add-users-to-teams.sh.j2",
+            output_file,
+            users=plan["users"].to_dict(orient="records"),
+            target_org=target_org,
+        )
+
+    # repos = get_repos_by_exclude("exclude")
+    # teams = get_teams_by_exclude("exclude")
+
+
+def cache_confirmed_mappings(mannequins_df):
+    """
+    Remembers the mappings a person confirmed, by login and node ID, for later
+    waves.  A target-user that `gh migrate manns` filled in from its proposed
+    match only counts once it's marked as reviewed.
+    """
+
+    target_users = mannequins_df["target-user"].fillna("").astype(str).str.strip()
+    confirmed = target_users != ""
+
+    if "proposed-user" in mannequins_df:
+        proposed = mannequins_df["proposed-user"].fillna("").astype(str).str.strip()
+
+        reviewed = pd.Series(False, index=mannequins_df.index)
+        if "reviewed" in mannequins_df:
+            reviewed = (
+                mannequins_df["reviewed"]
+                .fillna("")
+                .astype(str)
+                .str.strip()
+                .str.lower()
+                .isin(["true", "yes", "y", "x", "1", "1.0"])
+            )
+
+        # Entered or changed by hand, or an accepted proposal
+        confirmed &= (target_users != proposed) | reviewed
+
+    confirmed = mannequins_df[confirmed]
+
+    cache_put_many(
+        "mapping", dict(zip(confirmed["mannequin-user"], confirmed["target-user"]))
+    )
+
+    if "mannequin-id" in confirmed:
+        ids = confirmed[confirmed["mannequin-id"].notna()]
+        cache_put_many("mapping-id", dict(zip(ids["mannequin-id"], ids["target-user"])))
+
+
+def get_post_migration_plan(workbook_path, dry_run, wave, full=False):
+    """
+    Yields the teams, team permissions, repo visibilities and team memberships
+    to apply to each of a wave's target orgs, from the before-source snapshots.
+
+    Unless full is set, anything the after-target snapshots show is already
+    in place is left out, so reruns only do the remaining work.
+    """
+
+    if dry_run:
+        snapshots_dir = os.path.join("snapshots", "dry-run")
+    else:
+        snapshots_dir = "snapshots"
+
+    orgs = get_orgs_for_wave_df(wave, workbook_path)
+
+    # The mannequins file contains the mapping of mannequin-user to target-user
+    mannequins_df = get_mannequin_df(workbook_path)
+    cache_confirmed_mappings(mannequins_df)
+
+    # Get the orgs for this wave
+    wave_orgs = orgs[orgs["wave"] == wave].to_dict(orient="records")
+
+    for org in wave_orgs:
+        source_org = org["source_name"]
+        if dry_run:
+            target_org = org["dry_run_target_name"]
+        else:
+            target_org = org["target_name"]
+
+        ###############################
+        # Teams
+        ###############################
+        teams_file = os.path.join(
+            snapshots_dir, f"before-source-{source_org}-teams.csv"
+        )
+
+        teams_df = pd.read_csv(teams_file)
+
+        ###############################
+        # Team permissions
+        ###############################
+        team_repos_file = os.path.join(
+            snapshots_dir, f"before-source-{source_org}-team-repos.csv"
+        )
+
+        team_repos_df = pd.read_csv(team_repos_file)
+
+        ###############################
+        # Repo visibility
+        ###############################
+        repos_file = os.path.join(
+            snapshots_dir, f"before-source-{source_org}-repos.csv"
+        )
+
+        repos_df = pd.read_csv(repos_file)
+
+        # We only need the name and visibility columns
+        repos_df = repos_df[["name", "visibility"]]
+
+        ###############################
+        # Team memberships
+        ###############################
         team_users_file = os.path.join(
             snapshots_dir, f"before-source-{source_org}-team-users.csv"
         )
 
         team_users_df = pd.read_csv(team_users_file)
 
-        # The mannequins file contains the mapping of mannequin-user to target-user
-        mannequins_df = get_mannequin_df(workbook_path)
-
         # Map the user from the source org to target org using mannequins.csv
         mapped_users = team_users_df.merge(
             # We use a left join so we can identify unmapped users
@@ -281,6 +471,14 @@ def post_migration(workbook_path, dry_run, wave):
             right_on=["mannequin-user", "source_org"],
         )
 
+        # Fall back to mappings confirmed in earlier waves
+        unmapped = mapped_users["target-user"].isna()
+        if unmapped.any():
+            cached = cache_get_many("mapping", mapped_users.loc[unmapped, "login"])
+            mapped_users.loc[unmapped, "target-user"] = mapped_users.loc[
+                unmapped, "login"
+            ].map(cached)
+
         # Identify unmapped users
         unmapped_users = mapped_users[mapped_users["target-user"].isna()]
         if not unmapped_users.empty:
@@ -289,18 +487,169 @@ def post_migration(workbook_path, dry_run, wave):
                 unmapped_users[["team_slug", "login", "mannequin-user", "target-user"]]
             )
 
-        output_file = f"{prefix}-wave-{int(wave)}-add-users-to-teams-{target_org}.sh"
-
         mapped_users = mapped_users[mapped_users["target-user"].notna()]
-        render_template(
-            "add-users-to-teams.sh.j2",
-            output_file,
-            users=mapped_users.to_dict(orient="records"),
-            target_org=target_org,
+
+        ###############################
+        # Diff against the target org
+        ###############################
+        if not full:
+            teams_df = remove_satisfied(
+                teams_df,
+                read_snapshot(snapshots_dir, "after-target", target_org, "teams"),
+                {"slug": "slug"},
+            )
+            team_repos_df = remove_satisfied(
+                team_repos_df,
+                read_snapshot(snapshots_dir, "after-target", target_org, "team-repos"),
+                {"team_slug": "team_slug", "name": "name", "role_name": "role_name"},
+            )
+            repos_df = remove_satisfied(
+                repos_df,
+                read_snapshot(snapshots_dir, "after-target", target_org, "repos"),
+                {"name": "name", "visibility": "visibility"},
+            )
+            mapped_users = remove_satisfied(
+                mapped_users,
+                read_snapshot(snapshots_dir, "after-target", target_org, "team-users"),
+                {"team_slug": "team_slug", "target-user": "login", "role": "role"},
+            )
+
+            logger.info(
+                f"** {target_org} still needs: {len(teams_df)} teams, "
+                f"{len(team_repos_df)} team permissions, "
+                f"{len(repos_df)} repo visibilities, "
+                f"{len(mapped_users)} team memberships"
+            )
+
+        yield {
+            "source_org": source_org,
+            "target_org": target_org,
+            "teams": teams_df,
+            "team_repos": team_repos_df,
+            "repos": repos_df,
+            "users": mapped_users,
+        }
+
+
+def read_snapshot(snapshots_dir, timing, org, type):
+    """Returns a snapshot CSV, or None if it doesn't exist or is empty"""
+
+    snapshot_file = os.path.join(snapshots_dir, f"{timing}-{org}-{type}.csv")
+
+    if not os.path.exists(snapshot_file):
+        # Nothing can be left out of the plan without it
+        logger.warning(
+            f"*** {snapshot_file} not found, planning every {type} action for {org}"
         )
+        return None
 
-    # repos = get_repos_by_exclude("exclude")
-    # teams = get_teams_by_exclude("exclude")
+    try:
+        return pd.read_csv(snapshot_file, dtype=str)
+    except pd.errors.EmptyDataError:
+        return None
+
+
+def remove_satisfied(desired, current, keys):
+    """
+    Removes the rows of desired that already exist in current.  keys maps
+    the columns of desired to the matching columns of current, and values
+    are compared case-insensitively.
+    """
+
+    if current is None or current.empty or desired.empty:
+        return desired
+
+    if not set(keys.values()).issubset(current.columns):
+        return desired
+
+    def normalize(df, cols):
+        return pd.DataFrame(
+            {f"_key{i}": df[col].astype(str).str.lower() for i, col in enumerate(cols)}
+        )
+
+    desired_keys = normalize(desired, keys.keys())
+    current_keys = normalize(current, keys.values()).drop_duplicates()
+
+    satisfied = (
+        desired_keys.merge(current_keys, how="left", indicator=True)[
+            "_merge"
+        ].to_numpy()
+        == "both"
+    )
+
+    return desired[~satisfied]
+
+
+def get_team_permission(role_name):
+    """Maps a team's repo role name to the REST API permission"""
+
+    permissions = {"read": "pull", "write": "push"}
+
+    # Anything else is admin, maintain, triage or a custom role
+    return permissions.get(role_name, role_name)
+
+
+def get_post_migration_actions(plan):
+    """
+    Turns a target org's post-migration plan into REST API calls, mirroring
+    the post-migration script templates.  Teams must be created (stage 0)
+    before their permissions and memberships are set (stage 1).
+    """
+
+    target_org = plan["target_org"]
+
+    actions = []
+
+    for team in plan["teams"].to_dict(orient="records"):
+        actions.append(
+            {
+                "stage": 0,
+                "action": "create-team",
+                "method": "POST",
+                "url": f"/orgs/{target_org}/teams",
+                "data": {"name": team["slug"], "privacy": team["privacy"]},
+            }
+        )
+
+    for repo in plan["repos"].to_dict(orient="records"):
+        actions.append(
+            {
+                "stage": 0,
+                "action": "update-repo-visibility",
+                "method": "PATCH",
+                "url": f"/repos/{target_org}/{repo['name']}",
+                "data": {"visibility": repo["visibility"]},
+            }
+        )
+
+    for repo in plan["team_repos"].to_dict(orient="records"):
+        actions.append(
+            {
+                "stage": 1,
+                "action": "update-team-perms",
+                "method": "PUT",
+                "url": f"/orgs/{target_org}/teams/{repo['team_slug']}"
+                f"/repos/{target_org}/{repo['name']}",
+                "data": {"permission": get_team_permission(repo["role_name"])},
+            }
+        )
+
+    for user in plan["users"].to_dict(orient="records"):
+        actions.append(
+            {
+                "stage": 1,
+                "action": "add-users-to-teams",
+                "method": "PUT",
+                "url": f"/orgs/{target_org}/teams/{user['team_slug']}"
+                f"/memberships/{user['target-user']}",
+                "data": {"role": user["role"]},
+            }
+        )
+
+    for action in actions:
+        action["target_org"] = target_org
+
+    return actions
 
 
 # ###############################
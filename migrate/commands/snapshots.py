@@ -9,6 +9,7 @@ from githubkit import GitHub
 from ..version import *
 
 from migrate.workbook import get_orgs_for_wave
+from migrate.cache import cache_get_many, cache_put_many
 
 
 @click.command()
@@ -27,10 +28,29 @@ from migrate.workbook import get_orgs_for_wave
     required=False,
     default="./report/InfoMagnus - Migration Workbook.xlsx",
 )
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=0,
+    help=(
+        "Hours to reuse the team roles of an interrupted snapshot when resuming "
+        "it (0, the default, to always look up)"
+    ),
+)
 @click.argument("output_dir", required=False, default="snapshots")
 # @snapshot_before_after()
 def snapshots(
-    orgs, pat, before, after, source, target, dry_run, wave, workbook_path, output_dir
+    orgs,
+    pat,
+    before,
+    after,
+    source,
+    target,
+    dry_run,
+    wave,
+    workbook_path,
+    cache_ttl,
+    output_dir,
 ):
     ##########################################
     # Check command line fslags
@@ -72,13 +92,13 @@ def snapshots(
     if orgs is not None:
         for org in orgs:
             if before and source:
-                generate_snapshots("before", "source", org, pat, output_dir)
+                generate_snapshots("before", "source", org, pat, output_dir, cache_ttl)
             elif before and target:
-                generate_snapshots("before", "target", org, pat, output_dir)
+                generate_snapshots("before", "target", org, pat, output_dir, cache_ttl)
             elif after and source:
-                generate_snapshots("after", "source", org, pat, output_dir)
+                generate_snapshots("after", "source", org, pat, output_dir, cache_ttl)
             elif after and target:
-                generate_snapshots("after", "target", org, pat, output_dir)
+                generate_snapshots("after", "target", org, pat, output_dir, cache_ttl)
 
             else:
                 raise ValueError("Invalid source/target")
@@ -87,7 +107,7 @@ def snapshots(
 ##########################
 # Generate snapshots
 ##########################
-def generate_snapshots(timing, type, org_name, pat, output_dir):
+def generate_snapshots(timing, type, org_name, pat, output_dir, cache_ttl=0):
     """ """
     logger.info(f"** Generating {timing} {type} snapshots for {org_name}")
     github = GitHub(pat)
@@ -110,6 +130,16 @@ def generate_snapshots(timing, type, org_name, pat, output_dir):
     users = paginate(github.rest.orgs.list_members, org=org_name)
     write_to_csv(users, "users.csv")
 
+    # Remember the target users' node IDs, for `gh migrate reclaim`
+    if type == "target" and not users.empty:
+        cache_put_many(
+            "user",
+            {
+                user["login"]: user
+                for user in users[["login", "id", "node_id"]].to_dict(orient="records")
+            },
+        )
+
     # Save all repos in organization
     repos = paginate(github.rest.repos.list_for_org, org=org_name)
     write_to_csv(repos, "repos.csv")
@@ -147,15 +177,29 @@ def generate_snapshots(timing, type, org_name, pat, output_dir):
         # Add the team slug to the dataframe
         team_users["team_slug"] = team_slug
 
+        # Snapshots are a point in time, so cached roles are only reused when
+        # asked for, and only by the same snapshot (to resume an interrupted one)
+        prefix = f"{timing}-{type}/{org_name}/{team_slug}"
+        cached = cache_get_many(
+            "team-role",
+            [f"{prefix}/{login}" for login in team_users.get("login", [])],
+            cache_ttl,
+        )
+        roles = {}
+
         # Add each user's role to the dataframe
         for i, user in team_users.iterrows():
-            response = github.rest.teams.get_membership_for_user_in_org(
-                org=org_name, team_slug=team_slug, username=user["login"]
-            )
-            response = response.json()
-            team_users.loc[i, "role"] = response["role"]
+            key = f"{prefix}/{user['login']}"
+            if key not in cached:
+                response = github.rest.teams.get_membership_for_user_in_org(
+                    org=org_name, team_slug=team_slug, username=user["login"]
+                )
+                roles[key] = response.json()["role"]
+            team_users.loc[i, "role"] = cached.get(key, roles.get(key))
             team_users.loc[i, "org"] = org_name
 
+        cache_put_many("team-role", roles)
+
         all_team_users.append(team_users)
 
     all_team_repos = pd.concat(all_team_repos, ignore_index=True)
@@ -0,0 +1,179 @@
+import re
+import time
+import click
+import pandas as pd
+from githubkit import GitHub
+from githubkit.exception import (
+    GraphQLFailed,
+    RequestError,
+    RequestFailed,
+    RequestTimeout,
+)
+from loguru import logger
+
+from migrate.commands.stats import auto_retry_handler
+from migrate.workbook import get_orgs_for_wave
+
+# States still waiting for, or undergoing, migration
+ACTIVE_STATES = ["queued", "notStarted", "inProgress", "pendingValidation"]
+DONE_STATES = ["succeeded", "failed", "failedValidation"]
+
+# Errors that a later poll may not hit (5xx, timeouts, rate limits, ...)
+TRANSIENT_ERRORS = (GraphQLFailed, RequestError, RequestFailed, RequestTimeout)
+
+
+@click.command()
+@click.option("--org", "orgs", multiple=True)
+@click.option("--pat", "pat", required=True)
+@click.option("--dry-run", is_flag=True, help="Is this a dry-run?")
+@click.option("--wave", type=int, help="Wave number", required=True)
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.option("--watch", is_flag=True, help="Keep polling until all are done")
+@click.option(
+    "--min-interval", type=float, default=10, help="Fastest polling interval (secs)"
+)
+@click.option(
+    "--max-interval", type=float, default=120, help="Slowest polling interval (secs)"
+)
+def status(orgs, pat, dry_run, wave, workbook_path, watch, min_interval, max_interval):
+    """
+    Show the migration status of a wave's target orgs.
+    """
+
+    ##########################################
+    # Get included target orgs from workbook
+    ##########################################
+    if orgs == ():
+        if dry_run:
+            orgs = get_orgs_for_wave("dry_run_target_name", wave, workbook_path)
+        else:
+            orgs = get_orgs_for_wave("target_name", wave, workbook_path)
+
+    logger.info(f"* Checking {orgs}")
+
+    github = GitHub(pat, auto_retry=auto_retry_handler)
+    query, variables = build_status_query(orgs)
+
+    history = []
+    interval = min_interval
+
+    while True:
+        try:
+            counts = get_status(github, query, variables, orgs)
+        except TRANSIENT_ERRORS as e:
+            # One failed poll shouldn't end a watch that runs for hours
+            if not watch:
+                raise
+
+            interval = min(max_interval, interval * 2)
+            logger.info(f"*** Polling failed, retrying in {interval:.0f}s: {e!r}")
+            time.sleep(interval)
+            continue
+
+        history.append((time.monotonic(), counts))
+
+        throughput, eta = get_progress(history)
+
+        if watch:
+            click.clear()
+        click.echo(render_status(counts, throughput, eta))
+
+        if not watch or counts[ACTIVE_STATES].to_numpy().sum() == 0:
+            break
+
+        # Poll faster while migrations are finishing, and back off when idle
+        if len(history) > 1 and not history[-2][1].equals(counts):
+            interval = max(min_interval, interval / 2)
+        else:
+            interval = min(max_interval, interval * 2)
+
+        time.sleep(interval)
+
+
+def build_status_query(orgs):
+    """
+    Builds a single query fetching the migration status of every org, by
+    repeating migration-status.graphql's selection under an alias per org
+    """
+
+    with open("migrate/graphql/migration-status.graphql") as f:
+        text = "\n".join(
+            line for line in f.read().splitlines() if not line.startswith("#")
+        )
+
+    # Grab the selection inside organization(login: $org) { ... }
+    selection = re.search(r"organization\(login: \$org\) \{(.*)\}\s*\}", text, re.S)
+    selection = selection.group(1)
+
+    params = ", ".join(f"$org{i}: String!" for i in range(len(orgs)))
+    aliases = "\n".join(
+        f"  org{i}: organization(login: $org{i}) {{{selection}}}"
+        for i in range(len(orgs))
+    )
+
+    query = f"query ({params}) {{\n{aliases}\n}}"
+    variables = {f"org{i}": org for i, org in enumerate(orgs)}
+
+    return query, variables
+
+
+def get_status(github, query, variables, orgs):
+    """Returns the count of migrations in each state for each org"""
+
+    response = github.graphql(query, variables=variables)
+
+    rows = []
+    for i, org in enumerate(orgs):
+        states = response[f"org{i}"] or {}
+        rows.append(
+            {"org": org} | {state: states[state]["totalCount"] for state in states}
+        )
+
+    return pd.DataFrame(rows, columns=["org"] + ACTIVE_STATES + DONE_STATES).fillna(0)
+
+
+def get_progress(history, window=5):
+    """
+    Returns the recent throughput (migrations finished per minute) and the
+    estimated minutes until all migrations are finished
+    """
+
+    if len(history) < 2:
+        return None, None
+
+    (start, first), (end, last) = history[-min(window, len(history))], history[-1]
+
+    finished = last[DONE_STATES].to_numpy().sum() - first[DONE_STATES].to_numpy().sum()
+    throughput = finished / ((end - start) / 60)
+
+    remaining = last[ACTIVE_STATES].to_numpy().sum()
+    eta = remaining / throughput if throughput > 0 else None
+
+    return throughput, eta
+
+
+def render_status(counts, throughput, eta):
+    """Renders the status table, with totals, throughput and ETA"""
+
+    table = counts.copy()
+    table.loc[len(table)] = ["TOTAL"] + table.drop(columns="org").sum().tolist()
+
+    lines = [
+        time.strftime("%Y-%m-%d %H:%M:%S"),
+        table.to_string(index=False),
+        "",
+        (
+            f"Throughput: {throughput:.1f} repos/min"
+            if throughput is not None
+            else "Throughput: -"
+        ),
+        f"ETA: {eta:.0f} mins" if eta is not None else "ETA: -",
+    ]
+
+    return "\n".join(lines)
@@ -0,0 +1,65 @@
+import os
+import click
+import pandas as pd
+from loguru import logger
+
+from migrate.store import STORE_PATH, get_store, ingest_dir, put_df
+from migrate.workbook import get_sheet_df
+
+# Workbook sheets edited by hand, stored as they are
+MAPPING_SHEETS = {"mapping-org": "Mapping - Org", "mapping-user": "Mapping - User"}
+
+
+@click.group()
+def store():
+    pass
+
+
+@store.command()
+@click.option(
+    "-w",
+    "--workbook",
+    "workbook_path",
+    required=False,
+    default="./report/InfoMagnus - Migration Workbook.xlsx",
+)
+@click.argument("dirs", nargs=-1)
+def ingest(workbook_path, dirs):
+    """
+    Store the stats, snapshots and mappings of every wave.
+    """
+
+    for directory in dirs or ["logs", "snapshots"]:
+        if os.path.isdir(directory):
+            sources = ingest_dir(directory)
+            logger.info(f"* Stored {len(sources)} files from {directory}")
+
+    if os.path.exists(workbook_path):
+        for kind, sheet_name in MAPPING_SHEETS.items():
+            # Skip sheets that are missing or empty
+            try:
+                df = get_sheet_df(workbook_path, sheet_name)
+            except (KeyError, IndexError):
+                continue
+
+            put_df(kind, df, f"workbook:{sheet_name}")
+            logger.info(f"* Stored {len(df)} rows from '{sheet_name}'")
+
+
+@store.command()
+@click.argument("sql")
+@click.option("-o", "--output", "output", help="Write the results to a CSV")
+def query(sql, output):
+    """
+    Query the store, e.g. 'SELECT * FROM stats WHERE "owner.login" = ...'.
+    """
+
+    with get_store(STORE_PATH) as connection:
+        results = pd.read_sql(sql, connection)
+
+    if output:
+        results.to_csv(output, index=False)
+        logger.info(f"* Wrote {len(results)} rows to {output}")
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", None):
+            print(results.to_string(index=False))
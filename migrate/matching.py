@@ -0,0 +1,130 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+# Confidence of each kind of match, strongest first
+MATCHERS = [
+    ("email", 1.0),
+    ("login", 0.9),
+    ("login-variant", 0.8),
+    ("name", 0.6),
+]
+
+
+def normalize_email(email):
+    if not isinstance(email, str) or "@" not in email:
+        return None
+    return email.strip().lower()
+
+
+def normalize_name(name):
+    """
+    Normalizes a display name, ignoring accents, punctuation, case and word
+    order (so "Doe, Jane" matches "Jane Doe")
+    """
+    if not isinstance(name, str):
+        return None
+
+    name = unicodedata.normalize("NFKD", name)
+    words = re.findall(r"[a-z]+", name.encode("ascii", "ignore").decode().lower())
+
+    # Single names are too ambiguous to match on
+    if len(words) < 2:
+        return None
+
+    return " ".join(sorted(words))
+
+
+def login_variants(login):
+    """
+    Returns the normalized forms of a login.  EMU logins have an
+    "_<shortcode>" suffix, so the part before the last "_" is also a variant.
+    """
+    if not isinstance(login, str):
+        return []
+
+    login = login.lower()
+    variants = {re.sub(r"[^a-z0-9]", "", login)}
+
+    if "_" in login:
+        variants.add(re.sub(r"[^a-z0-9]", "", login.rsplit("_", 1)[0]))
+
+    return [v for v in variants if v]
+
+
+def build_member_index(members):
+    """
+    Indexes the target org members by email, login, login variant and
+    normalized name.  Each key maps to the set of member logins sharing it.
+    """
+
+    index = {method: defaultdict(set) for method, _ in MATCHERS}
+
+    for member in members.to_dict(orient="records"):
+        login = member["login"]
+
+        email = normalize_email(member.get("email"))
+        if email:
+            index["email"][email].add(login)
+
+        index["login"][login.lower()].add(login)
+
+        for variant in login_variants(login):
+            index["login-variant"][variant].add(login)
+
+        name = normalize_name(member.get("name"))
+        if name:
+            index["name"][name].add(login)
+
+    return index
+
+
+def get_mannequin_keys(mannequin):
+    """Returns the lookup keys of a mannequin for each kind of match"""
+
+    return {
+        "email": [
+            normalize_email(mannequin.get("mannequin-email")),
+            normalize_email(mannequin.get("email")),
+        ],
+        "login": [mannequin["mannequin-user"].lower()],
+        "login-variant": login_variants(mannequin["mannequin-user"]),
+        "name": [normalize_name(mannequin.get("name"))],
+    }
+
+
+def match_mannequins(mannequins, members):
+    """
+    Proposes a target user for each mannequin, with a confidence score and
+    the kind of match.  Each mannequin is looked up in hash indexes over the
+    members, so matching is linear in the number of mannequins and members.
+    Keys shared by several members are ambiguous and skipped.
+    """
+
+    index = build_member_index(members)
+
+    matches = []
+
+    for mannequin in mannequins.to_dict(orient="records"):
+        keys = get_mannequin_keys(mannequin)
+        match = {"proposed-user": None, "match-confidence": 0.0, "match-method": ""}
+
+        for method, confidence in MATCHERS:
+            candidates = set()
+            for key in keys[method]:
+                if key:
+                    candidates |= index[method].get(key, set())
+
+            if len(candidates) == 1:
+                match = {
+                    "proposed-user": candidates.pop(),
+                    "match-confidence": confidence,
+                    "match-method": method,
+                }
+                break
+
+        matches.append(match)
+
+    return pd.DataFrame(matches, index=mannequins.index)
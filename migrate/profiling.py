@@ -0,0 +1,116 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+from loguru import logger
+
+# Only stdlib here, since `gh migrate --profile` imports this for every command
+PROFILE_DIR = os.path.join("logs", "debug")
+
+# {phase: [calls, seconds]} while profiling, None otherwise
+phases = None
+profiler = None
+started_at = None
+
+
+@contextmanager
+def phase(name):
+    """Times a phase of a command (e.g. "save") when profiling"""
+    if phases is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = phases.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += time.perf_counter() - start
+
+
+def start_profiling():
+    """Starts the CPU profile and phase timings"""
+    global phases, profiler, started_at
+
+    phases = {}
+    started_at = time.perf_counter()
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+
+def stop_profiling(command):
+    """Writes the profile and a readable summary of it to logs/debug/"""
+    global phases, profiler
+
+    profiler.disable()
+    wall_time = time.perf_counter() - started_at
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"profile-{command or 'cli'}-{datetime.now():%Y%m%d-%H%M%S}"
+
+    # Open with `python -m pstats` or snakeviz
+    profile_path = os.path.join(PROFILE_DIR, f"{name}.prof")
+    profiler.dump_stats(profile_path)
+
+    summary_path = os.path.join(PROFILE_DIR, f"{name}.txt")
+    with open(summary_path, "w") as f:
+        f.write(get_summary(wall_time))
+
+    logger.info(f"*** Profile written to {summary_path} and {profile_path}")
+
+    phases = None
+    profiler = None
+
+
+def get_peak_rss():
+    """Returns the peak RSS (in MB) of this process, and of its child processes"""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None, None
+
+    # Linux reports KB, macOS bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+
+    return tuple(
+        resource.getrusage(who).ru_maxrss * scale / 1024 / 1024
+        for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]
+    )
+
+
+def get_summary(wall_time, top=40):
+    """Returns the command, its peak RSS, phase timings and slowest functions"""
+    lines = [f"gh migrate {' '.join(sys.argv[1:])}", ""]
+
+    lines.append(f"Wall time: {wall_time:.2f} s")
+
+    peak_rss, children_rss = get_peak_rss()
+    if peak_rss is None:
+        lines.append("Peak RSS: n/a")
+    else:
+        lines.append(
+            f"Peak RSS: {peak_rss:.1f} MB (child processes: {children_rss:.1f} MB)"
+        )
+
+    lines += ["", f"{'Phase':<24} {'Calls':>6} {'Seconds':>9} {'Share':>6}"]
+    for name, (calls, seconds) in sorted(
+        phases.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        lines.append(
+            f"{name:<24} {calls:>6} {seconds:>9.2f} {seconds / wall_time:>6.0%}"
+        )
+
+    lines += ["", f"Top {top} functions by cumulative time", ""]
+
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+    lines.append(output.getvalue())
+
+    return "\n".join(lines)
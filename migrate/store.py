@@ -0,0 +1,377 @@
+import os
+import re
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+from contextlib import closing, contextmanager
+from loguru import logger
+
+from migrate.profiling import phase
+
+# Every wave's stats, snapshots, logs and mappings, in one place
+STORE_PATH = os.path.join("logs", "store.sqlite")
+
+# `gh migrate stats` files, e.g. before-source-wave-1.csv
+STATS_FILE = re.compile(r"^(before|after)-(source|target)-wave-(\d+)\.csv$")
+
+# `gh migrate snapshots` files, e.g. before-source-<org>-team-users.csv
+SNAPSHOT_FILE = re.compile(
+    r"^(before|after)-(source|target)-(.+?)-(team-repos|team-users|users|repos|teams)"
+    r"\.csv$"
+)
+
+# The columns of each kind of data that we look up by
+INDEXES = {
+    "stats": [["owner.login", "name"]],
+    "snapshot-repos": [["name"]],
+    "snapshot-team-repos": [["team_slug", "name"]],
+    "snapshot-team-users": [["team_slug", "login"]],
+    "snapshot-users": [["login"]],
+    "snapshot-teams": [["slug"]],
+    "migration-logs": [["org", "repo"]],
+    "repo-timings": [["org", "repo"]],
+}
+
+
+@contextmanager
+def get_store(path=STORE_PATH):
+    """
+    Opens (and creates, if needed) the store, committing when the block
+    succeeds and closing it either way
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with closing(sqlite3.connect(path)) as connection, connection:
+        create_tables(connection)
+        yield connection
+
+
+def create_tables(connection):
+    """Creates the table describing each stored dataset"""
+
+    connection.execute(
+        """
+        CREATE TABLE IF NOT EXISTS datasets (
+            source TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            timing TEXT,
+            side TEXT,
+            org TEXT,
+            wave INTEGER,
+            dry_run INTEGER,
+            version TEXT,
+            dtypes TEXT NOT NULL
+        )
+        """
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS datasets_kind ON datasets (kind, wave, org)"
+    )
+
+
+def quote(name):
+    """Quotes a column or table name, which may contain dots and dashes"""
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_file_version(path):
+    """Identifies a version of a file, so we know when to ingest it again"""
+
+    stat = os.stat(path)
+
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def describe_file(path):
+    """
+    Returns what a file holds from its name, e.g. {"kind": "stats",
+    "timing": "before", "side": "source", "wave": 1}, or None if we don't
+    recognize it
+    """
+
+    name = os.path.basename(path)
+    dry_run = "dry-run" in os.path.normpath(path).split(os.sep)
+
+    match = STATS_FILE.match(name)
+    if match:
+        timing, side, wave = match.groups()
+        return {
+            "kind": "stats",
+            "timing": timing,
+            "side": side,
+            "wave": int(wave),
+            "dry_run": dry_run,
+        }
+
+    match = SNAPSHOT_FILE.match(name)
+    if match:
+        timing, side, org, snapshot_type = match.groups()
+        return {
+            "kind": f"snapshot-{snapshot_type}",
+            "timing": timing,
+            "side": side,
+            "org": org,
+            "dry_run": dry_run,
+        }
+
+    return None
+
+
+def get_dtypes(df):
+    """
+    Returns the type pandas inferred for each column, so we can restore them
+    from the text we store
+    """
+
+    dtypes = {}
+
+    for column in df.columns:
+        dtype = str(df[column].dtype)
+
+        # Booleans with blanks are objects
+        if dtype == "object":
+            values = df[column].dropna()
+            if len(values) and values.map(type).eq(bool).all():
+                dtype = "bool"
+
+        dtypes[column] = dtype
+
+    return dtypes
+
+
+def infer_dtypes(df):
+    """
+    Returns the types pd.read_csv would infer for the columns of a CSV read
+    as text, without parsing it again
+    """
+
+    dtypes = {}
+
+    for column in df.columns:
+        values = df[column].dropna()
+
+        if not len(values):
+            # Blank columns are read as floats
+            dtypes[column] = "float64"
+        elif values.str.lower().isin(["true", "false"]).all():
+            dtypes[column] = "bool"
+        else:
+            try:
+                numbers = pd.to_numeric(values)
+            except (TypeError, ValueError):
+                dtypes[column] = "object"
+                continue
+
+            # Integers with blanks are read as floats
+            if len(values) < len(df) and numbers.dtype.kind in "iu":
+                dtypes[column] = "float64"
+            else:
+                dtypes[column] = str(numbers.dtype)
+
+    return dtypes
+
+
+def restore_dtypes(df, dtypes, parse_dates=None):
+    """Restores the inferred types of columns read back as text"""
+
+    for column in df.columns:
+        dtype = dtypes.get(column, "object")
+
+        if dtype == "bool":
+            values = df[column].str.lower() == "true"
+            if df[column].isna().any():
+                values = values.astype(object).where(df[column].notna(), np.nan)
+            df[column] = values
+        elif dtype.startswith(("int", "float")):
+            try:
+                df[column] = df[column].astype(dtype)
+            except (TypeError, ValueError):
+                # Blanks, from datasets without the column
+                df[column] = pd.to_numeric(df[column])
+        elif dtype.startswith("datetime64"):
+            df[column] = pd.to_datetime(df[column])
+
+    for column in parse_dates or []:
+        if column in df:
+            df[column] = pd.to_datetime(df[column])
+
+    return df
+
+
+def put_df(kind, df, source, dtypes=None, path=STORE_PATH, **fields):
+    """
+    Stores a DataFrame as the dataset from source, replacing any earlier
+    version of it.  fields (timing, side, org, wave, dry_run, version)
+    describe the dataset, for queries across waves.
+    """
+
+    table = quote(kind)
+    dtypes = dtypes or get_dtypes(df)
+
+    # Stored as text, like a CSV, so any value can be stored
+    df = df.astype(str).where(df.notna(), None)
+
+    with get_store(path) as store:
+        columns = [row[1] for row in store.execute(f"PRAGMA table_info({table})")]
+
+        if not columns:
+            store.execute(f"CREATE TABLE {table} (_source TEXT NOT NULL)")
+            store.execute(
+                f"CREATE INDEX {quote(kind + '_source')} ON {table} (_source)"
+            )
+            columns = ["_source"]
+
+        # Different versions of `gh migrate` write different columns
+        for column in df.columns:
+            if column not in columns:
+                store.execute(f"ALTER TABLE {table} ADD COLUMN {quote(column)}")
+
+        for index in INDEXES.get(kind, []):
+            if all(column in df for column in index):
+                store.execute(
+                    f"CREATE INDEX IF NOT EXISTS "
+                    f"{quote('_'.join([kind] + index))} ON {table} "
+                    f"({', '.join(quote(column) for column in index)})"
+                )
+
+        store.execute(f"DELETE FROM {table} WHERE _source = ?", [source])
+        store.executemany(
+            f"INSERT INTO {table} "
+            f"({', '.join(quote(column) for column in ['_source', *df.columns])}) "
+            f"VALUES ({', '.join('?' * (len(df.columns) + 1))})",
+            ([source, *row] for row in df.itertuples(index=False, name=None)),
+        )
+
+        store.execute(
+            "INSERT OR REPLACE INTO datasets "
+            "(source, kind, timing, side, org, wave, dry_run, version, dtypes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                source,
+                kind,
+                fields.get("timing"),
+                fields.get("side"),
+                fields.get("org"),
+                fields.get("wave"),
+                fields.get("dry_run"),
+                fields.get("version"),
+                json.dumps(dtypes, default=str),
+            ],
+        )
+
+
+def parse_file(file_path):
+    """Reads a CSV once, returning the types pandas infers and its text"""
+
+    df = pd.read_csv(file_path, dtype=str)
+
+    return infer_dtypes(df), df
+
+
+def ingest_file(file_path, path=STORE_PATH, **fields):
+    """
+    Stores a stats or snapshot CSV, unless this version of it is already
+    stored.  Returns the dataset's source key.
+    """
+
+    source = os.path.abspath(file_path)
+    version = get_file_version(file_path)
+
+    description = describe_file(file_path) or {"kind": "csv"}
+    description.update(fields)
+
+    with get_store(path) as store:
+        stored = store.execute(
+            "SELECT version FROM datasets WHERE source = ?", [source]
+        ).fetchone()
+
+    if stored and stored[0] == version:
+        return source
+
+    # The types pandas infers, and the text, exactly as written
+    dtypes, df = parse_file(file_path)
+
+    logger.info(f"** Store: ingesting {len(df)} rows from {file_path}")
+
+    put_df(
+        description.pop("kind"),
+        df,
+        source,
+        dtypes,
+        path,
+        version=version,
+        **description,
+    )
+
+    return source
+
+
+@phase("read data")
+def query(kind, columns=None, parse_dates=None, path=STORE_PATH, **fields):
+    """
+    Returns every stored row of a kind of data whose dataset matches fields,
+    e.g. query("stats", timing="before", side="source", wave=[1, 2]), with
+    the dataset's description as leading columns
+    """
+
+    where = ["d.kind = ?"]
+    params = [kind]
+
+    for field, value in fields.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        where.append(f"d.{field} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+
+    with get_store(path) as store:
+        datasets = store.execute(
+            f"SELECT d.dtypes FROM datasets d WHERE {' AND '.join(where)}", params
+        ).fetchall()
+
+        if not datasets:
+            return pd.DataFrame(columns=columns)
+
+        dtypes = {}
+        for (dataset_dtypes,) in datasets:
+            dtypes.update(json.loads(dataset_dtypes))
+
+        columns = [c for c in dtypes if columns is None or c in columns]
+
+        df = pd.read_sql(
+            "SELECT d.timing AS _timing, d.side AS _side, d.org AS _org, "
+            "d.wave AS _wave, d.dry_run AS _dry_run, "
+            f"{', '.join('t.' + quote(column) for column in columns)} "
+            f"FROM {quote(kind)} t JOIN datasets d ON d.source = t._source "
+            f"WHERE {' AND '.join(where)} ORDER BY t.rowid",
+            store,
+            params=params,
+            dtype=object,
+        )
+
+    df = df.where(df.notna(), np.nan)
+
+    return restore_dtypes(df, dtypes, parse_dates)
+
+
+def ingest_dir(directory, kinds=None, path=STORE_PATH):
+    """Stores every stats and snapshot CSV (of the given kinds) under a directory"""
+
+    sources = []
+
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            description = describe_file(file_path)
+            if description is None:
+                continue
+            if kinds is not None and description["kind"] not in kinds:
+                continue
+
+            try:
+                sources.append(ingest_file(file_path, path))
+            except pd.errors.EmptyDataError:
+                logger.info(f"*** Skipping empty {file_path}")
+
+    return sources
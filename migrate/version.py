@@ -1,10 +1,12 @@
 import os
 import functools
-from git import Repo
 from loguru import logger
 
 
 def get_branch(branch="engagement"):
+    # GitPython is slow to import, and only needed for checkpoints
+    from git import Repo
+
     repo = Repo(".")
 
     if branch in repo.heads:
@@ -27,6 +29,8 @@ def snapshot_before_after():
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            from git import Repo
+
             repo = Repo(".")
 
             # Check if engagement branch already exists
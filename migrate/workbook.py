@@ -1,26 +1,71 @@
 import os
+import re
+import zipfile
+import numpy as np
 import pandas as pd
+from contextlib import contextmanager
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from loguru import logger
 
+from migrate.profiling import phase
+
 import pytz
 import datetime
 
 import openpyxl
 from openpyxl.styles import Font
 from openpyxl import load_workbook
-from openpyxl.worksheet.table import TableStyleInfo
+from openpyxl.cell.cell import Cell, ILLEGAL_CHARACTERS_RE
+from openpyxl.utils.datetime import to_excel
+from openpyxl.worksheet.table import TableColumn, TableStyleInfo
 
 # Create a table style
 table_style = TableStyleInfo(
     name="TableStyleMedium9", showFirstColumn=False, showLastColumn=False
 )
 
+# Longer tables are streamed into the saved file, rather than built in memory
+STREAM_MIN_ROWS = 1000
+
+# Excel won't open a sheet with more rows than this
+MAX_SHEET_ROWS = 1048576
+
+# Tables continued on "(part N)" sheets are named "<table>_part_N"
+TABLE_PART = re.compile(r"^(.+)_part_(\d+)$")
+
+# Pre-migration risks: (flag column, table name, heading, weight, sort column)
+RISKS = [
+    ("risk: large repo", "Large_Repos", "Large Repos", 3, "diskUsage"),
+    ("risk: large PRs", "Large_PRs", "Large PRs", 3, "pullRequests.totalCount"),
+    (
+        "risk: webhooks",
+        "Webhooks_Repos",
+        "Repos with webhooks",
+        2,
+        "webhooks.totalCount",
+    ),
+    ("risk: actions", "Actions_Repos", "Repos with actions", 2, "lastWorkflowRun"),
+    ("risk: stale", "Stale_Repos", "Stale Repos", 1, "pushedAt"),
+    ("risk: archived", "Archived_Repos", "Archived Repos", 1, "isArchived"),
+    ("risk: locked", "Locked_Repos", "Locked Repos", 2, "isLocked"),
+    (
+        "risk: packages",
+        "Has_Packages",
+        "Repos with packages",
+        3,
+        "packages.totalCount",
+    ),
+]
+RISK_SCORE_COLUMN = "risk score"
+
 
 def initialize_workbook():
     workbook = load_workbook(os.path.join("report", "template", "workbook.xlsx"))
     workbook.save(os.path.join("report", "InfoMagnus - Migration Workbook.xlsx"))
 
 
+@phase("load workbook")
 def get_workbook(workbook_path):
     workbook = load_workbook(workbook_path)
     workbook.filename = workbook_path
@@ -29,16 +74,126 @@ def get_workbook(workbook_path):
     return workbook
 
 
-def get_mannequin_df(workbook_path):
-    # Load the Org Mappings
-    wb = load_workbook(workbook_path, data_only=True)
+@contextmanager
+def workbook_session(workbook_path, sidecar=None):
+    """
+    Loads the workbook for a command's changes and saves them all at once
+    when the command is done.  Nothing is saved if the command fails.
+    Tables too long for a sheet are written to sidecar ("csv" or "parquet")
+    files if a sidecar format is given, or split across sheets otherwise.
+    """
+    check_workbook_unlocked(workbook_path)
+
+    workbook = get_workbook(workbook_path)
+    workbook.in_session = True
+    workbook.sidecar = sidecar
+
+    yield workbook
+
+    workbook.in_session = False
+    save_workbook(workbook)
+
+
+def check_workbook_unlocked(workbook_path):
+    """Fails early if the workbook is open in Excel or LibreOffice"""
+    folder, name = os.path.split(os.path.abspath(workbook_path))
+
+    # Excel drops the first two characters of long names from its lock file
+    lock_files = [f"~${name}", f"~${name[2:]}", f".~lock.{name}#"]
+
+    for lock_file in lock_files:
+        if os.path.exists(os.path.join(folder, lock_file)):
+            raise PermissionError(
+                f"{workbook_path} is open in another program ({lock_file} "
+                "exists), close it and try again"
+            )
+
+    # On Windows, an open workbook can't be opened for writing
+    try:
+        with open(workbook_path, "r+b"):
+            pass
+    except PermissionError:
+        raise PermissionError(
+            f"{workbook_path} is locked by another program, close it and try again"
+        )
+
+
+def get_file_key(workbook_path):
+    """Identifies a version of a file, so cached reads expire when it changes"""
+    stat = os.stat(workbook_path)
+
+    return os.path.abspath(workbook_path), stat.st_mtime_ns, stat.st_size
+
+
+def get_table_dfs(workbook_path, prefix):
+    """Returns all of the workbook's tables whose names start with prefix"""
+    tables = read_table_dfs(get_file_key(workbook_path), prefix)
 
-    ws = wb["Mapping - User"]
+    # Callers are free to modify what they get back
+    return {name: df.copy() for name, df in tables.items()}
 
-    data = list(ws.values)
+
+@lru_cache(maxsize=32)
+@phase("read workbook")
+def read_table_dfs(file_key, prefix):
+    # Table definitions aren't available in read-only mode
+    wb = load_workbook(file_key[0], data_only=True)
+
+    parts = {}
+
+    for ws in wb.worksheets:
+        for name, ref in ws.tables.items():
+            if not name.startswith(prefix):
+                continue
+
+            data = [[cell.value for cell in row] for row in ws[ref]]
+
+            # Tables split across sheets are put back together
+            match = TABLE_PART.match(name)
+            name, part = (match[1], int(match[2])) if match else (name, 1)
+
+            # Set the first row as the header
+            parts.setdefault(name, []).append(
+                (part, pd.DataFrame(data[1:], columns=data[0]))
+            )
+
+    return {
+        name: pd.concat(
+            [df for _, df in sorted(dfs, key=lambda p: p[0])], ignore_index=True
+        )
+        for name, dfs in parts.items()
+    }
+
+
+def get_sheet_df(workbook_path, sheet_name):
+    """Returns a sheet whose first row is a header as a dataframe"""
+    return read_sheet_df(get_file_key(workbook_path), sheet_name).copy()
+
+
+@lru_cache(maxsize=32)
+@phase("read workbook")
+def read_sheet_df(file_key, sheet_name):
+    # Read-only mode only parses the sheet we ask for
+    wb = load_workbook(file_key[0], read_only=True, data_only=True)
+
+    try:
+        data = list(wb[sheet_name].values)
+
+        # Followed by the rows of any "(part N)" sheets, each with a header
+        part = 2
+        while get_part_name(sheet_name, part) in wb.sheetnames:
+            data.extend(list(wb[get_part_name(sheet_name, part)].values)[1:])
+            part += 1
+    finally:
+        wb.close()
 
     # Set the first row as the header
-    df = pd.DataFrame(data[1:], columns=data[0])
+    return pd.DataFrame(data[1:], columns=data[0])
+
+
+def get_mannequin_df(workbook_path):
+    # Load the User Mappings
+    df = get_sheet_df(workbook_path, "Mapping - User")
 
     # Get orgs for wave, filter out excluded orgs
     users = df[(df["exclude"] == False)]
@@ -63,14 +218,7 @@ def get_orgs_for_wave(org_type, wave, workbook_path):
 
 def get_orgs_for_wave_df(wave, workbook_path):
     # Load the Org Mappings
-    wb = load_workbook(workbook_path, data_only=True)
-
-    ws = wb["Mapping - Org"]
-
-    data = list(ws.values)
-
-    # Set the first row as the header
-    df = pd.DataFrame(data[1:], columns=data[0])
+    df = get_sheet_df(workbook_path, "Mapping - Org")
 
     # Get orgs for wave, filter out excluded orgs
     orgs = df[(df["exclude"] == False) & (df["wave"] == wave)]
@@ -81,28 +229,92 @@ def get_orgs_for_wave_df(wave, workbook_path):
     return orgs
 
 
-def autosize_columns(worksheet):
-    for column in worksheet.columns:
-        max_length = 0
-        column = column[0].column_letter
-        for cell in worksheet[column]:
-            try:  # Necessary to avoid error on empty cells
-                if len(str(cell.value)) > max_length:
-                    max_length = len(cell.value)
-            except:
-                pass
-        adjusted_width = (max_length + 2) * 1.2
+def autosize_columns(worksheet, df, heading=""):
+    """
+    Widens the columns to fit a table that was just added.  The widest string
+    seen in each column is kept on the worksheet, so tables are measured once,
+    as they're added, instead of rescanning the whole sheet.
+    """
+    if not hasattr(worksheet, "column_lengths"):
+        worksheet.column_lengths = {}
+
+    lengths = worksheet.column_lengths
+
+    # The heading sits above the table in column A
+    if heading != "":
+        lengths["A"] = max(lengths.get("A", 0), len(heading))
+
+    for i, column in enumerate(df.columns, start=1):
+        letter = openpyxl.utils.get_column_letter(i)
+
+        values = df.iloc[:, i - 1]
+
+        max_length = len(str(column))
+        if values.dtype == object:
+            # Only strings are measured, like the cell scan this replaced.
+            # Object columns can also hold bools, numbers and blanks.
+            strings = values[values.map(type) == str]
+            if len(strings):
+                max_length = max(max_length, int(strings.str.len().max()))
+
+        lengths[letter] = max(lengths.get(letter, 0), max_length)
+
+        adjusted_width = (lengths[letter] + 2) * 1.2
         adjusted_width = min(adjusted_width, 60)
-        worksheet.column_dimensions[column].width = adjusted_width
+        worksheet.column_dimensions[letter].width = adjusted_width
 
 
+@phase("write sheets")
 def write_table(worksheet, df, table_name, heading=""):
+    """
+    Writes df as a table, returning the worksheet to write any more tables
+    to.  Rows that don't fit in the sheet continue in a "<table>_part_N"
+    table on a "(part N)" sheet.  Tables too long for any sheet are written
+    to a sidecar file instead, if the workbook_session has a sidecar format.
+    """
     # If pushedAt exists in the df
     if "pushedAt" in df.columns:
         df["pushedAt"] = df["pushedAt"].dt.tz_localize(None)
     if "updatedAt" in df.columns:
         df["updatedAt"] = df["updatedAt"].dt.tz_localize(None)
 
+    # The heading and header rows
+    header_rows = 2 if heading != "" else 1
+
+    if (
+        getattr(worksheet.parent, "sidecar", None)
+        and len(df) + header_rows > MAX_SHEET_ROWS
+    ):
+        write_sidecar(worksheet, df, table_name, heading)
+        return worksheet
+
+    part = 1
+    while True:
+        part_name = table_name if part == 1 else f"{table_name}_part_{part}"
+        part_heading = (
+            heading if part == 1 or heading == "" else f"{heading} (part {part})"
+        )
+
+        room = MAX_SHEET_ROWS - get_last_row(worksheet) - header_rows
+        if len(df) <= room:
+            write_table_rows(worksheet, df, part_name, part_heading)
+            return worksheet
+
+        if room > 0:
+            write_table_rows(worksheet, df.iloc[:room], part_name, part_heading)
+            df = df.iloc[room:]
+            part += 1
+
+        worksheet = add_part_sheet(worksheet)
+
+
+def write_table_rows(worksheet, df, table_name, heading=""):
+    """
+    Writes df as a table.  Tables longer than STREAM_MIN_ROWS only have their
+    header, first and last rows written through openpyxl, and the rows in
+    between are streamed straight into the sheet's XML when the workbook is
+    saved with save_workbook.
+    """
     # Add a header with the table name
     if heading != "":
         worksheet.append([heading])
@@ -117,10 +329,7 @@ def write_table(worksheet, df, table_name, heading=""):
         from openpyxl.worksheet.table import Table, TableStyleInfo
 
         num_rows, num_cols = df.shape
-        if heading != "":
-            start_col, start_row = "A", worksheet.max_row + 1
-        else:
-            start_col, start_row = "A", worksheet.max_row
+        start_col, start_row = "A", get_last_row(worksheet) + 1
         end_col = openpyxl.utils.get_column_letter(num_cols)
         end_row = start_row + num_rows
 
@@ -129,27 +338,336 @@ def write_table(worksheet, df, table_name, heading=""):
             ref=f"{start_col}{start_row}:{end_col}{end_row}",
             tableStyleInfo=table_style,
         )
+
+        # Otherwise openpyxl reads the header back from every cell in the table
+        table.tableColumns = [
+            TableColumn(id=i, name=str(name)) for i, name in enumerate(df.columns, 1)
+        ]
+
         worksheet.add_table(table)
 
         # Add the data
         worksheet.append(df.columns.to_list())
+
+        if num_rows > STREAM_MIN_ROWS:
+            worksheet.append(next(df.iloc[:1].itertuples(index=False, name=None)))
+            add_streamed_rows(worksheet, df.iloc[1:-1], start_row + 2)
+            worksheet.append(next(df.iloc[-1:].itertuples(index=False, name=None)))
+
+            # Group added rows
+            worksheet.row_dimensions.group(start_row + 1, hidden=False)
+            worksheet.row_dimensions.group(end_row, hidden=False)
+            autosize_columns(worksheet, df, heading)
+
+            # Move past the streamed rows to the next empty row
+            worksheet.append([])
+            return
+
         for row in df.itertuples(index=False, name=None):
             worksheet.append(row)
 
         # Group added rows
         worksheet.row_dimensions.group(start_row + 1, end_row, hidden=False)
-        autosize_columns(worksheet)
+        autosize_columns(worksheet, df, heading)
 
     # Move to the next empty row
     worksheet.append([])
 
 
+def get_part_name(sheet_name, part):
+    """Returns the name of a sheet's "(part N)" sheet, within Excel's 31 characters"""
+    suffix = f" (part {part})"
+
+    return f"{sheet_name[:31 - len(suffix)]}{suffix}"
+
+
+def add_part_sheet(worksheet):
+    """Adds the next "(part N)" sheet after a full sheet"""
+    workbook = worksheet.parent
+
+    base_title = getattr(worksheet, "base_title", worksheet.title)
+    part = getattr(worksheet, "part", 1) + 1
+    title = get_part_name(base_title, part)
+
+    # Replace a part left from an earlier run.  Not with delete_worksheet,
+    # since truncated titles can make the other parts look like its parts.
+    if title in workbook.sheetnames:
+        del workbook[title]
+        getattr(workbook, "streamed_rows", {}).pop(title, None)
+
+    part_sheet = _add_sheet(
+        workbook,
+        title,
+        workbook.index(worksheet) + 1,
+        worksheet.sheet_properties.tabColor,
+        False,
+    )
+    part_sheet.base_title = base_title
+    part_sheet.part = part
+
+    logger.info(f"*** '{base_title}' is full, continuing on '{part_sheet.title}'")
+
+    return part_sheet
+
+
+def write_sidecar(worksheet, df, table_name, heading=""):
+    """
+    Writes a table too long for a sheet to a compressed file next to the
+    workbook, and links to it above a preview of its first rows
+    """
+    workbook = worksheet.parent
+
+    folder = os.path.join(os.path.dirname(os.path.abspath(workbook.filename)), "tables")
+    os.makedirs(folder, exist_ok=True)
+
+    if workbook.sidecar == "parquet":
+        file_name = f"{table_name}.parquet"
+        df.to_parquet(os.path.join(folder, file_name), index=False)
+    else:
+        file_name = f"{table_name}.csv.gz"
+        df.to_csv(os.path.join(folder, file_name), index=False)
+
+    logger.info(f"*** Wrote {len(df)} rows of '{table_name}' to tables/{file_name}")
+
+    if heading != "":
+        worksheet.append([heading])
+        worksheet[f"A{worksheet.max_row}"].font = Font(bold=True, size=12)
+
+    # Relative, so the link survives moving the report folder
+    worksheet.append(
+        [f"{len(df)} rows, see tables/{file_name} (first {STREAM_MIN_ROWS} below)"]
+    )
+    link = worksheet[f"A{worksheet.max_row}"]
+    link.hyperlink = f"tables/{file_name}"
+    link.style = "Hyperlink"
+
+    write_table_rows(worksheet, df.head(STREAM_MIN_ROWS), table_name)
+
+
+def add_streamed_rows(worksheet, df, first_row):
+    """Queues df's rows to be streamed into the sheet when it's saved"""
+    workbook = worksheet.parent
+
+    if not hasattr(workbook, "streamed_rows"):
+        workbook.streamed_rows = {}
+
+    # Registers the default date format in the workbook's styles
+    date_style = Cell(worksheet, value=datetime.datetime(2000, 1, 1)).style_id
+
+    workbook.streamed_rows.setdefault(worksheet.title, []).append(
+        {"df": df, "first_row": first_row, "date_style": date_style}
+    )
+
+    # Keep appending after the streamed rows
+    set_last_row(worksheet, first_row + len(df) - 1)
+
+
+def get_last_row(worksheet):
+    """
+    Returns the row worksheet.append last wrote to.  This and set_last_row
+    are the only places that rely on openpyxl's internals (pinned in
+    requirements.txt), since openpyxl has no public API for either.
+    """
+    return worksheet._current_row
+
+
+def set_last_row(worksheet, row):
+    """Makes worksheet.append continue after row"""
+    worksheet._current_row = row
+
+
+@phase("save")
+def save_workbook(workbook):
+    """
+    Saves the workbook and streams in any queued rows, replacing the file
+    only once it's complete.  Inside a workbook_session, the save waits
+    until the session ends.
+    """
+    if getattr(workbook, "in_session", False):
+        return
+
+    temp_path = f"{workbook.filename}.tmp"
+
+    try:
+        workbook.save(temp_path)
+
+        streamed_rows = getattr(workbook, "streamed_rows", {})
+        if streamed_rows:
+            write_streamed_rows(temp_path, streamed_rows)
+
+        os.replace(temp_path, workbook.filename)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def get_sheet_parts(archive):
+    """Returns {sheet title: part name} for a saved workbook"""
+    workbook_xml = archive.read("xl/workbook.xml").decode("utf-8")
+    rels_xml = archive.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+
+    targets = {}
+    for rel in re.findall(r"<Relationship [^>]*>", rels_xml):
+        rel_id = re.search(r'Id="([^"]+)"', rel).group(1)
+        target = re.search(r'Target="([^"]+)"', rel).group(1)
+        targets[rel_id] = (
+            target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        )
+
+    parts = {}
+    for sheet in re.findall(r"<sheet [^>]*>", workbook_xml):
+        title = re.search(r'name="([^"]+)"', sheet).group(1)
+        rel_id = re.search(r'r:id="([^"]+)"', sheet).group(1)
+        parts[unescape_attr(title)] = targets[rel_id]
+
+    return parts
+
+
+def unescape_attr(value):
+    return (
+        value.replace("&quot;", '"')
+        .replace("&apos;", "'")
+        .replace("&lt;", "<")
+        .replace("&gt;", ">")
+        .replace("&amp;", "&")
+    )
+
+
+def write_streamed_rows(workbook_path, streamed_rows):
+    """
+    Rewrites the saved workbook, streaming the queued rows into their sheets'
+    XML.  Every other part of the file is copied as is.
+    """
+    temp_path = f"{workbook_path}.tmp"
+
+    with zipfile.ZipFile(workbook_path) as source, zipfile.ZipFile(
+        temp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1
+    ) as target:
+        parts = get_sheet_parts(source)
+        streams = {parts[title]: rows for title, rows in streamed_rows.items()}
+
+        for item in source.infolist():
+            if item.filename not in streams:
+                target.writestr(item, source.read(item))
+                continue
+
+            sheet_xml = source.read(item).decode("utf-8")
+
+            with target.open(item.filename, "w", force_zip64=True) as f:
+                start = 0
+                for rows in sorted(
+                    streams[item.filename], key=lambda r: r["first_row"]
+                ):
+                    # The streamed rows go just before the table's last row
+                    last_row = f'<row r="{rows["first_row"] + len(rows["df"])}"'
+                    end = sheet_xml.find(last_row, start)
+                    if end == -1:
+                        raise ValueError(
+                            f"Can't find {last_row}> in {item.filename} to stream "
+                            "rows before, the workbook wasn't saved"
+                        )
+                    f.write(sheet_xml[start:end].encode("utf-8"))
+                    for chunk in iter_rows_xml(**rows):
+                        f.write(chunk.encode("utf-8"))
+                    start = end
+
+                f.write(sheet_xml[start:].encode("utf-8"))
+
+    os.replace(temp_path, workbook_path)
+
+
+def iter_rows_xml(df, first_row, date_style, chunk_size=10000):
+    """Yields the XML of df's rows, chunk_size rows at a time"""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start : start + chunk_size].reset_index(drop=True)
+        rows = pd.Series(np.arange(len(chunk)) + first_row + start).astype(str)
+
+        cells = pd.Series("", index=chunk.index)
+        for i, column in enumerate(chunk.columns):
+            letter = openpyxl.utils.get_column_letter(i + 1)
+            cells += get_column_xml(letter, chunk.iloc[:, i], rows, date_style)
+
+        yield "".join('<row r="' + rows + '" outlineLevel="1">' + cells + "</row>")
+
+
+def get_column_xml(letter, values, rows, date_style):
+    """Returns the XML of each of a column's cells, built a column at a time"""
+    refs = f'<c r="{letter}' + rows
+    kind = values.dtype.kind if isinstance(values.dtype, np.dtype) else "O"
+
+    if kind == "b":
+        xml = refs + '" t="b"><v>' + values.astype(int).astype(str) + "</v></c>"
+    elif kind in "iu":
+        xml = refs + '" t="n"><v>' + values.astype(str) + "</v></c>"
+    elif kind == "f":
+        xml = refs + '" t="n"><v>' + values.astype(str) + "</v></c>"
+        xml[~np.isfinite(values)] = ""
+    elif kind == "M":
+        serials = (values - pd.Timestamp("1899-12-30")) / pd.Timedelta(days=1)
+        xml = refs + f'" s="{date_style}" t="n"><v>' + serials.astype(str) + "</v></c>"
+        xml[values.isna()] = ""
+    elif values.map(type).isin([str, type(None)]).all():
+        text = (
+            values.fillna("")
+            .str.replace(ILLEGAL_CHARACTERS_RE, "", regex=True)
+            .str.replace("&", "&amp;")
+            .str.replace("<", "&lt;")
+            .str.replace(">", "&gt;")
+        )
+        xml = refs + '" t="inlineStr"><is><t xml:space="preserve">' + text
+        xml = xml + "</t></is></c>"
+        xml[values.isna()] = ""
+    else:
+        # Mixed columns are written a value at a time
+        xml = pd.Series(
+            [
+                get_cell_xml(f"{letter}{r}", value, date_style)
+                for r, value in zip(rows, values)
+            ],
+            index=values.index,
+        )
+
+    return xml
+
+
+def get_cell_xml(ref, value, date_style):
+    """Returns a cell's XML, written the way openpyxl would store the value"""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return ""
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, np.integer)):
+        return f'<c r="{ref}" t="n"><v>{value}</v></c>'
+    if isinstance(value, (float, np.floating)):
+        if not np.isfinite(value):
+            return ""
+        return f'<c r="{ref}" t="n"><v>{float(value)!r}</v></c>'
+    if isinstance(value, datetime.datetime):
+        value = to_excel(value.replace(tzinfo=None))
+        return f'<c r="{ref}" s="{date_style}" t="n"><v>{value!r}</v></c>'
+
+    text = escape(ILLEGAL_CHARACTERS_RE.sub("", str(value)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
 def delete_worksheet(workbook, sheet_name):
     """ """
     # Delete the worksheet if it already exists
     if sheet_name in workbook.sheetnames:
         del workbook[sheet_name]
 
+    # Rows queued for the old sheet don't belong to its replacement
+    getattr(workbook, "streamed_rows", {}).pop(sheet_name, None)
+
+    # Nor do the sheets it was continued on
+    part = 2
+    while get_part_name(sheet_name, part) in workbook.sheetnames:
+        del workbook[get_part_name(sheet_name, part)]
+        getattr(workbook, "streamed_rows", {}).pop(
+            get_part_name(sheet_name, part), None
+        )
+        part += 1
+
     return workbook
 
 
@@ -190,7 +708,9 @@ def update_manns_worksheet(workbook, sheet_name, users):
     """ """
     desired_index = workbook.sheetnames.index("Cover") + 3
     worksheet = add_sheet(workbook, sheet_name, 0, desired_index, "002060")
-    write_table(worksheet, stats, "User Mappings")
+    write_table(worksheet, users, "Mapping_User")
+
+    save_workbook(workbook)
 
 
 def add_inventory_worksheet(workbook, sheet_name, stats):
@@ -255,7 +775,32 @@ def add_org_mapping(workbook, sheet_name, stats):
     # Create org mapping table
     write_table(worksheet, stats, "Mapping_Org")
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
+
+
+def update_org_mapping(workbook, sheet_name, updates):
+    """
+    Updates the org mapping table in place, keyed by "source_name".  Only the
+    columns in updates are changed, so manual edits to the others are kept.
+    """
+
+    worksheet = workbook[sheet_name]
+
+    header = [cell.value for cell in worksheet[1]]
+    columns = {name: header.index(name) for name in updates.columns}
+
+    updates = updates.set_index("source_name")
+
+    for row in worksheet.iter_rows(min_row=2):
+        source_name = row[columns["source_name"]].value
+        if source_name not in updates.index:
+            continue
+
+        for col, value in updates.loc[source_name].items():
+            if not pd.isna(value):
+                row[columns[col]].value = value
+
+    save_workbook(workbook)
 
 
 def add_user_mapping(workbook, sheet_name, stats):
@@ -264,11 +809,11 @@ def add_user_mapping(workbook, sheet_name, stats):
     desired_index = workbook.sheetnames.index("Cover") + 2
     worksheet = add_sheet(workbook, sheet_name, 0, desired_index, "FFC000")
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
 
 
 def add_post_migration_timings_report(
-    dry_run, wave, workbook, sheet_name, org_timings, repo_timings
+    dry_run, wave, workbook, sheet_name, org_timings, repo_timings, phase_throughput
 ):
     """ """
     desired_index = workbook.sheetnames.index("Cover") + 1
@@ -278,10 +823,18 @@ def add_post_migration_timings_report(
         f"migration_logs_dry_run_{wave}" if dry_run else f"migration_logs_prod_{wave}"
     )
 
-    write_table(worksheet, org_timings, f"org_timings_{suffix}", "Org Timings")
+    worksheet = write_table(
+        worksheet, org_timings, f"org_timings_{suffix}", "Org Timings"
+    )
+    worksheet = write_table(
+        worksheet,
+        phase_throughput,
+        f"phase_throughput_{suffix}",
+        "Org Phase Throughput",
+    )
     write_table(worksheet, repo_timings, f"repo_timings_{suffix}", "Repo Timings")
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
 
 
 def add_post_migration_logs_report(dry_run, wave, workbook, sheet_name, repo_results):
@@ -299,7 +852,7 @@ def add_post_migration_logs_report(dry_run, wave, workbook, sheet_name, repo_res
 
     write_table(worksheet, repo_results, f"repo_results_{suffix}", "Repo Warnings")
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
 
 
 def add_post_migration_stats_report(dry_run, wave, workbook, sheet_name, stats):
@@ -325,59 +878,82 @@ def add_post_migration_snaps_report(
 
     suffix = f"snapshots_dry_run_{wave}" if dry_run else f"snapshots_prod_{wave}"
 
-    write_table(worksheet, repos, f"repos_{suffix}", "Repos")
-    write_table(worksheet, users, f"users_{suffix}", "Users")
-    write_table(worksheet, teams, f"teams_{suffix}", "Teams")
-    write_table(worksheet, team_users, f"team_users_{suffix}", "Team Users")
+    worksheet = write_table(worksheet, repos, f"repos_{suffix}", "Repos")
+    worksheet = write_table(worksheet, users, f"users_{suffix}", "Users")
+    worksheet = write_table(worksheet, teams, f"teams_{suffix}", "Teams")
+    worksheet = write_table(worksheet, team_users, f"team_users_{suffix}", "Team Users")
     write_table(worksheet, team_repos, f"team_repos_{suffix}", "Team Repos")
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
+
+
+def get_risk_flags(stats):
+    """
+    Flags each repo's pre-migration risks, in one vectorized pass over the
+    inventory
+    """
+    pushed_at = pd.to_datetime(stats["pushedAt"])
+    if pushed_at.dt.tz is None:
+        pushed_at = pushed_at.dt.tz_localize("UTC")
+
+    stale_before = datetime.datetime.now(pytz.UTC) - datetime.timedelta(days=60)
+
+    return pd.DataFrame(
+        {
+            "risk: large repo": stats["diskUsage"] > 1000000,
+            "risk: large PRs": stats["pullRequests.totalCount"] > 1000,
+            "risk: webhooks": stats["webhooks.totalCount"] > 0,
+            "risk: actions": stats["lastWorkflowRun"].notna(),
+            "risk: stale": pushed_at < stale_before,
+            "risk: archived": stats["isArchived"].eq(True),
+            "risk: locked": stats["isLocked"].eq(True),
+            "risk: packages": stats["packages.totalCount"] > 0,
+        },
+        index=stats.index,
+    )
 
 
-def add_pre_migration_report(workbook, sheet_name, stats):
-    """ """
-    desired_index = workbook.sheetnames.index("Cover") + 1
-    worksheet = add_sheet(workbook, sheet_name, 0, desired_index, "7030A0")
+def add_risk_columns(stats):
+    """Adds the risk flags, and their weighted risk score, to the inventory"""
+    flags = get_risk_flags(stats)
+    weights = pd.Series({risk[0]: risk[3] for risk in RISKS})
 
-    # Create large repos table
-    df = stats[stats["diskUsage"] > 1000000].sort_values(by="diskUsage")
-    write_table(worksheet, df, "Large_Repos", "Large Repos")
+    # Replace the columns of an inventory that was scored before
+    stats = stats.drop(columns=[*flags.columns, RISK_SCORE_COLUMN], errors="ignore")
 
-    # Create large PRs table
-    df = stats[stats["pullRequests.totalCount"] > 1000].sort_values(
-        by="pullRequests.totalCount"
+    return pd.concat(
+        [stats, flags, (flags * weights).sum(axis=1).rename(RISK_SCORE_COLUMN)],
+        axis=1,
     )
-    write_table(worksheet, df, "Large_PRs", "Large PRs")
 
-    # Create webhooks table
-    df = stats[stats["webhooks.totalCount"] > 0].sort_values(by="webhooks.totalCount")
-    write_table(worksheet, df, "Webhooks_Repos", "Repos with webhooks")
 
-    # Create actions table
-    df = stats[stats["lastWorkflowRun"] != None].sort_values("lastWorkflowRun")
-    write_table(worksheet, df, "Actions_Repos", "Repos with actions")
+def add_pre_migration_report(workbook, sheet_name, stats):
+    """ """
+    desired_index = workbook.sheetnames.index("Cover") + 1
+    worksheet = add_sheet(workbook, sheet_name, 0, desired_index, "7030A0")
 
-    # Create stale repos table
-    stats["pushedAt"] = stats["pushedAt"].dt.tz_localize("UTC")
-    df = stats[
-        stats["pushedAt"]
-        < datetime.datetime.now(pytz.UTC) - datetime.timedelta(days=60)
-    ].sort_values("pushedAt")
-    write_table(worksheet, df, "Stale_Repos", "Stale Repos")
+    if RISK_SCORE_COLUMN not in stats:
+        stats = add_risk_columns(stats)
 
-    # Create archived repos table
-    df = stats[stats["isArchived"] == True].sort_values("isArchived")
-    write_table(worksheet, df, "Archived_Repos", "Archived Repos")
+    flags = [risk[0] for risk in RISKS]
 
-    # Create locked repos table
-    df = stats[stats["isLocked"] == True].sort_values("isLocked")
-    write_table(worksheet, df, "Locked_Repos", "Locked Repos")
+    # Create risk scores table, riskiest first
+    df = stats[stats[RISK_SCORE_COLUMN] > 0].sort_values(
+        RISK_SCORE_COLUMN, ascending=False, kind="stable"
+    )
+    worksheet = write_table(
+        worksheet,
+        df[["owner.login", "name", RISK_SCORE_COLUMN, *flags]],
+        "Risk_Scores",
+        "Risk Scores",
+    )
 
-    # Create repos with packages table
-    df = stats[stats["packages.totalCount"] > 0].sort_values("packages.totalCount")
-    write_table(worksheet, df, "Has_Packages", "Repos with packages")
+    # Create a table of the repos with each risk
+    for flag, table_name, heading, _, sort_column in RISKS:
+        df = stats[stats[flag]].sort_values(sort_column)
+        worksheet = write_table(worksheet, df, table_name, heading)
 
     # def identify_git_lfs():
     # # TODO: Need to figure out how to implement this
 
-    workbook.save(workbook.filename)
+    save_workbook(workbook)
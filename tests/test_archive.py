@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from migrate.commands import archive
+
+
+@pytest.fixture
+def logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    os.makedirs("logs/dry-run")
+    pd.DataFrame(
+        {
+            "owner.login": ["org", "org"],
+            "name": ["archived", "active"],
+            "isArchived": [True, False],
+        }
+    ).to_csv("logs/dry-run/before-source-wave-1.csv", index=False)
+
+    async def get_archived_states(pat, repos, batch_size):
+        return [repo["name"] == "archived" for repo in repos]
+
+    monkeypatch.setattr(archive, "get_archived_states", get_archived_states)
+
+    return tmp_path
+
+
+def test_archive_dry_run_only_verifies(logs, monkeypatch):
+    async def run_actions(*args):
+        raise AssertionError("--dry-run must not update any repo")
+
+    monkeypatch.setattr(archive, "run_actions", run_actions)
+
+    result = CliRunner().invoke(
+        archive.archive, ["--pat", "pat", "--wave", "1", "--dry-run"]
+    )
+    assert result.exit_code == 0, result.output
+
+    results = pd.read_csv("logs/dry-run/archive-repos-wave-1.csv")
+    assert list(results["url"]) == ["/repos/org/archived", "/repos/org/active"]
+    assert list(results["verified"]) == [True, False]
+    assert results["status"].isna().all()
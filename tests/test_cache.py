@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from migrate import cache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache" / "users.sqlite")
+
+
+def test_logins_ignore_case(path):
+    cache.cache_put_many("profile", {"Octocat": {"name": "Mona"}}, path=path)
+
+    assert cache.cache_get_many("profile", ["OCTOCAT", "hubot"], path=path) == {
+        "OCTOCAT": {"name": "Mona"}
+    }
+
+
+def test_node_ids_are_case_sensitive(path):
+    cache.cache_put_many("mannequin", {"MDQ6VXNlcjE=": {"a": 1}}, path=path)
+    cache.cache_put_many("mannequin", {"mdq6vxnlcje=": {"a": 2}}, path=path)
+
+    assert cache.cache_get_many(
+        "mannequin", ["MDQ6VXNlcjE=", "mdq6vxnlcje=", "MDQ6VXNLCJE="], path=path
+    ) == {"MDQ6VXNlcjE=": {"a": 1}, "mdq6vxnlcje=": {"a": 2}}
+
+
+def test_expired_entries_are_ignored(path, monkeypatch):
+    cache.cache_put_many("profile", {"octocat": {}}, path=path)
+
+    now = cache.time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 2 * 3600)
+
+    assert cache.cache_get_many("profile", ["octocat"], ttl=1, path=path) == {}
+    assert cache.cache_get_many("profile", ["octocat"], ttl=3, path=path) == {
+        "octocat": {}
+    }
+    assert cache.cache_get_many("profile", ["octocat"], ttl=0, path=path) == {}
+
+
+def test_get_cache_closes_connection(path):
+    with cache.get_cache(path) as connection:
+        pass
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute("SELECT 1")
@@ -0,0 +1,98 @@
+import os
+import subprocess
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from migrate.commands import execute
+
+GH_STUB = os.path.join(os.path.dirname(__file__), "stubs", "gh")
+
+
+@pytest.fixture
+def wave(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    stub_dir = tmp_path / "stub"
+    stub_dir.mkdir()
+    monkeypatch.setenv("GH_STUB_DIR", str(stub_dir))
+
+    os.makedirs("logs")
+    pd.DataFrame(
+        {
+            "owner.login": ["org"] * 5 + ["other-wave"],
+            "name": ["small", "fail-3", "huge", "medium", "large", "elsewhere"],
+            "diskUsage": [10, 200, 5000, 100, 1000, 9999],
+        }
+    ).to_csv("logs/before-source-wave-1.csv", index=False)
+
+    orgs = pd.DataFrame(
+        {
+            "source_name": ["org"],
+            "target_name": ["target-org"],
+            "dry_run_target_name": ["dry-run-org"],
+            "order": [1],
+        }
+    )
+    monkeypatch.setattr(execute, "get_orgs_for_wave_df", lambda *args: orgs)
+
+    # Record the order the jobs are started in
+    started = []
+    popen = subprocess.Popen
+
+    def record_popen(command, **kwargs):
+        started.append(command[command.index("--source-repo") + 1])
+        return popen(command, **kwargs)
+
+    monkeypatch.setattr(subprocess, "Popen", record_popen)
+
+    return stub_dir, started
+
+
+def test_execute_runs_jobs_largest_first(wave):
+    stub_dir, started = wave
+
+    result = CliRunner().invoke(
+        execute.execute,
+        [
+            "--wave",
+            "1",
+            "--gh",
+            GH_STUB,
+            "--max-jobs",
+            "2",
+            "--poll-interval",
+            "0.05",
+            "--source-pat",
+            "source",
+            "--target-pat",
+            "target",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+
+    # Largest first, and only the wave's repos
+    assert started == ["huge", "large", "fail-3", "medium", "small"]
+
+    # Never more than --max-jobs at once
+    running = [int(n) for n in (stub_dir / "running.log").read_text().split()]
+    assert len(running) == 5
+    assert max(running) == 2
+
+    results = pd.read_csv("logs/migration-jobs-wave-1.csv")
+    assert sorted(results["name"]) == [
+        "org/fail-3",
+        "org/huge",
+        "org/large",
+        "org/medium",
+        "org/small",
+    ]
+
+    returncodes = dict(zip(results["name"], results["returncode"]))
+    assert returncodes.pop("org/fail-3") == 3
+    assert set(returncodes.values()) == {0}
+
+    # Each job's output is kept in its own log
+    log = results.set_index("name").loc["org/huge", "log"]
+    assert open(log).read() == "[stub] Migrating huge\n"
@@ -0,0 +1,168 @@
+import json
+import asyncio
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+from githubkit import GitHub
+
+from migrate.commands import reclaim
+
+
+class StubGraphQL(BaseHTTPRequestHandler):
+    """Answers GraphQL requests like the GitHub API, recording each one"""
+
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+
+        query, variables = body["query"], body.get("variables") or {}
+
+        if "organization(login: $org)" in query:
+            data = {"organization": {"id": f"O_{variables['org']}"}}
+        elif query.startswith("query"):
+            # Every user exists, except "ghost"
+            data = {
+                f"user{name[len('login'):]}": (
+                    None if login == "ghost" else {"id": f"U_{login}"}
+                )
+                for name, login in variables.items()
+            }
+        else:
+            data = {
+                f"reclaim{name[len('mannequin'):]}": {"clientMutationId": None}
+                for name in variables
+                if name.startswith("mannequin")
+            }
+
+        response = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def github_stub(tmp_path, monkeypatch):
+    # Keep the user cache out of the checkout
+    monkeypatch.chdir(tmp_path)
+
+    StubGraphQL.requests = []
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphQL)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(
+        reclaim,
+        "GitHub",
+        functools.partial(GitHub, base_url=f"http://127.0.0.1:{server.server_port}"),
+    )
+
+    yield StubGraphQL.requests
+
+    server.shutdown()
+    server.server_close()
+
+
+def get_mappings(count):
+    return [
+        (
+            "target-org",
+            pd.DataFrame(
+                {
+                    "mannequin-user": [f"mannequin-{i}" for i in range(count)],
+                    "mannequin-id": [f"M_{i}" for i in range(count)],
+                    "target-user": [f"user-{i}" for i in range(count)],
+                }
+            ),
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "skip_invitation, mutation, fields",
+    [
+        (False, "createAttributionInvitation", ["ownerId", "sourceId", "targetId"]),
+        (True, "reattributeMannequinToUser", ["orgId", "sourceId", "targetId"]),
+    ],
+)
+def test_reclaim_mannequins(github_stub, skip_invitation, mutation, fields):
+    results = asyncio.run(
+        reclaim.reclaim_mannequins(
+            "pat", get_mappings(5), skip_invitation, 2, 1000, batch_size=2
+        )
+    )
+
+    assert list(results["error"]) == [""] * 5
+
+    # The org, then its users in one request, then 3 batches of mannequins
+    assert len(github_stub) == 5
+    assert github_stub[0]["variables"] == {"org": "target-org"}
+    assert len(github_stub[1]["variables"]) == 5
+
+    mutations = github_stub[2:]
+    assert sorted(len(request["variables"]) - 1 for request in mutations) == [
+        2,
+        4,
+        4,
+    ]
+
+    for request in mutations:
+        assert request["query"].count(mutation) == (len(request["variables"]) - 1) // 2
+        for field in fields:
+            assert f"{field}: $" in request["query"]
+        assert request["variables"]["org"] == "O_target-org"
+
+    reclaimed = {
+        request["variables"][f"mannequin{i}"]: request["variables"][f"user{i}"]
+        for request in mutations
+        for i in range(len(request["variables"]) // 2)
+    }
+    assert reclaimed == {f"M_{i}": f"U_user-{i}" for i in range(5)}
+
+
+def test_reclaim_mannequins_skips_missing_users(github_stub):
+    mappings = get_mappings(3)
+    mappings[0][1].loc[1, "target-user"] = "ghost"
+
+    results = asyncio.run(
+        reclaim.reclaim_mannequins("pat", mappings, False, 2, 1000, batch_size=3)
+    )
+
+    assert list(results["error"]) == ["", "target-user not found", ""]
+
+    # Only the found users are sent, in a single batch
+    assert len(github_stub) == 3
+    assert set(github_stub[2]["variables"]) == {
+        "org",
+        "mannequin0",
+        "user0",
+        "mannequin2",
+        "user2",
+    }
+
+
+def test_reclaim_mannequins_reuses_cached_users(github_stub):
+    asyncio.run(
+        reclaim.reclaim_mannequins("pat", get_mappings(3), False, 2, 1000, batch_size=3)
+    )
+
+    # The first users were cached, so only the org and the new user are looked up
+    del github_stub[:]
+    results = asyncio.run(
+        reclaim.reclaim_mannequins("pat", get_mappings(4), False, 2, 1000, batch_size=4)
+    )
+
+    assert list(results["error"]) == [""] * 4
+    assert len(github_stub) == 3
+    assert github_stub[1]["variables"] == {"login0": "user-3"}
+    assert github_stub[2]["variables"]["user0"] == "U_user-0"
@@ -0,0 +1,26 @@
+from migrate.commands import report
+
+LOG = """\
+[2024-04-12T01:00:00Z] INFO -- Migration started
+[2024-04-12T01:01:00Z] WARN -- Exporting took longer than expected
+[2024-04-12T01:02:00Z] INFO -- Export started
+[2024-04-12T01:10:00Z] INFO -- Archive upload in progress
+[2024-04-12T01:15:00Z] ERROR -- Importing the wiki failed
+[2024-04-12T01:20:00Z] INFO -- Import started
+[2024-04-12T01:30:00Z] INFO -- Migration complete
+"""
+
+
+def test_scan_repo_log_matches_phases_on_info_lines(tmp_path):
+    log_path = tmp_path / "repo.md"
+    log_path.write_text(LOG)
+
+    timing, results = report.scan_repo_log("org", "success", str(log_path))
+
+    assert timing["duration (mins)"] == 30
+    assert timing["export (mins)"] == 8
+    assert timing["upload (mins)"] == 10
+    assert timing["import (mins)"] == 10
+    assert timing["rewrite (mins)"] is None
+    assert timing["warnings"] == 1
+    assert timing["errors"] == 1
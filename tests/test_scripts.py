@@ -0,0 +1,32 @@
+import pandas as pd
+
+from migrate.cache import cache_get_many
+from migrate.commands import scripts
+
+
+def test_only_reviewed_mappings_are_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    mannequins = pd.DataFrame(
+        {
+            "mannequin-user": ["auto", "accepted", "edited", "typed", "unmapped"],
+            "mannequin-id": ["M_1", "M_2", "M_3", "M_4", "M_5"],
+            "target-user": ["mona", "hubot", "octocat", "monalisa", None],
+            "proposed-user": ["mona", "hubot", "mona", None, "mona"],
+            "reviewed": [False, True, False, None, False],
+        }
+    )
+
+    scripts.cache_confirmed_mappings(mannequins)
+
+    logins = mannequins["mannequin-user"]
+    assert cache_get_many("mapping", logins) == {
+        "accepted": "hubot",
+        "edited": "octocat",
+        "typed": "monalisa",
+    }
+    assert cache_get_many("mapping-id", mannequins["mannequin-id"]) == {
+        "M_2": "hubot",
+        "M_3": "octocat",
+        "M_4": "monalisa",
+    }
@@ -0,0 +1,60 @@
+import httpx
+import pytest
+from click.testing import CliRunner
+from githubkit.exception import RequestTimeout
+
+from migrate.commands import status
+
+
+class FlakyGitHub:
+    """Times out on the first poll, then reports one migration finishing"""
+
+    def __init__(self, *args, **kwargs):
+        self.polls = 0
+
+    def graphql(self, query, variables):
+        self.polls += 1
+
+        if self.polls == 1:
+            raise RequestTimeout(httpx.Request("POST", "https://api.github.com"))
+
+        in_progress = 1 if self.polls == 2 else 0
+        return {
+            "org0": {
+                "inProgress": {"totalCount": in_progress},
+                "succeeded": {"totalCount": 1 - in_progress},
+            }
+        }
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    sleeps = []
+
+    monkeypatch.setattr(status, "GitHub", FlakyGitHub)
+    monkeypatch.setattr(status, "build_status_query", lambda orgs: ("query", {}))
+    monkeypatch.setattr(status.time, "sleep", sleeps.append)
+
+    return sleeps
+
+
+def test_watch_keeps_polling_after_transient_errors(flaky):
+    result = CliRunner().invoke(
+        status.status,
+        ["--org", "org", "--pat", "pat", "--wave", "1", "--watch"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "TOTAL" in result.output
+
+    # Backed off after the timeout, then polled until the migration finished
+    assert flaky[0] == 20
+    assert len(flaky) == 2
+
+
+def test_single_check_reports_errors(flaky):
+    result = CliRunner().invoke(
+        status.status, ["--org", "org", "--pat", "pat", "--wave", "1"]
+    )
+
+    assert isinstance(result.exception, RequestTimeout)
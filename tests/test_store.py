@@ -0,0 +1,146 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from migrate import store
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        (
+            "logs/before-source-wave-1.csv",
+            {
+                "kind": "stats",
+                "timing": "before",
+                "side": "source",
+                "wave": 1,
+                "dry_run": False,
+            },
+        ),
+        (
+            "logs/dry-run/after-target-wave-12.csv",
+            {
+                "kind": "stats",
+                "timing": "after",
+                "side": "target",
+                "wave": 12,
+                "dry_run": True,
+            },
+        ),
+        *[
+            (
+                f"snapshots/before-source-my-org-{snapshot_type}.csv",
+                {
+                    "kind": f"snapshot-{snapshot_type}",
+                    "timing": "before",
+                    "side": "source",
+                    "org": "my-org",
+                    "dry_run": False,
+                },
+            )
+            for snapshot_type in [
+                "team-repos",
+                "team-users",
+                "users",
+                "repos",
+                "teams",
+            ]
+        ],
+        (
+            "snapshots/dry-run/after-target-my-team-org-team-users.csv",
+            {
+                "kind": "snapshot-team-users",
+                "timing": "after",
+                "side": "target",
+                "org": "my-team-org",
+                "dry_run": True,
+            },
+        ),
+        ("logs/before-source-wave-x.csv", None),
+        ("snapshots/before-source-my-org-members.csv", None),
+        ("report/repo-timings.csv", None),
+    ],
+)
+def test_describe_file(path, expected):
+    assert store.describe_file(path) == expected
+
+
+def write_stats(path, rows=3):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    pd.DataFrame(
+        {
+            "owner.login": ["org"] * rows,
+            "name": [f"repo-{i}" for i in range(rows)],
+            "diskUsage": range(rows),
+            "size": [np.nan if i % 2 else i * 1.5 for i in range(rows)],
+            "isArchived": [i % 2 == 0 for i in range(rows)],
+            "isFork": [True if i % 2 else None for i in range(rows)],
+            "blank": [None] * rows,
+            "pushedAt": ["2024-04-12T01:25:50Z"] * rows,
+        }
+    ).to_csv(path, index=False)
+
+
+def test_ingest_file_round_trips():
+    path = "logs/before-source-wave-1.csv"
+    write_stats(path)
+
+    store.ingest_file(path)
+
+    # Stored as text, and read back with the types pandas infers
+    stats = store.query("stats", parse_dates=["pushedAt"], wave=1)
+    assert list(stats["_timing"]) == ["before"] * 3
+    assert list(stats["_side"]) == ["source"] * 3
+
+    expected = pd.read_csv(path, parse_dates=["pushedAt"])
+    pd.testing.assert_frame_equal(stats[expected.columns], expected)
+
+
+def test_ingest_file_skips_stored_versions(monkeypatch):
+    path = "logs/before-source-wave-1.csv"
+    write_stats(path)
+
+    parsed = []
+    parse_file = store.parse_file
+    monkeypatch.setattr(
+        store,
+        "parse_file",
+        lambda file_path: parsed.append(file_path) or parse_file(file_path),
+    )
+
+    store.ingest_file(path)
+    store.ingest_file(path)
+    assert parsed == [path]
+
+    # A changed file replaces the stored version
+    write_stats(path, rows=4)
+    os.utime(path, ns=(0, 0))
+
+    store.ingest_file(path)
+    assert parsed == [path, path]
+    assert len(store.query("stats", wave=1)) == 4
+
+
+def test_get_store_closes_connection():
+    with store.get_store() as connection:
+        connection.execute("CREATE TABLE t (x)")
+        connection.execute("INSERT INTO t VALUES (1)")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.execute("SELECT 1")
+
+    # The insert was committed
+    with store.get_store() as connection:
+        assert connection.execute("SELECT x FROM t").fetchall() == [(1,)]
@@ -0,0 +1,100 @@
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from migrate import workbook
+
+
+def test_autosize_columns_measures_only_strings():
+    # Booleans with blanks are read as an object column
+    df = pd.read_csv(io.StringIO("isFork,name\nTrue,a\n,abc\nFalse,\n"))
+    df["mixed"] = pd.Series([1, "a much longer value", 3.5], dtype=object)
+
+    worksheet = openpyxl.Workbook().active
+    workbook.write_table(worksheet, df, "Mixed")
+
+    assert worksheet.column_lengths == {"A": 6, "B": 4, "C": 19}
+    assert worksheet.column_dimensions["C"].width == (19 + 2) * 1.2
+
+
+@pytest.fixture
+def workbook_path(tmp_path, monkeypatch):
+    # Stream anything longer than a few rows, so the tests stay small
+    monkeypatch.setattr(workbook, "STREAM_MIN_ROWS", 5)
+
+    path = str(tmp_path / "workbook.xlsx")
+    openpyxl.Workbook().save(path)
+
+    return path
+
+
+def get_table(rows, offset=0):
+    return pd.DataFrame(
+        {
+            "name": [f"repo <{i + offset}> & co" for i in range(rows)],
+            "diskUsage": [i + offset for i in range(rows)],
+            "size": [None if i % 3 else i * 1.5 for i in range(rows)],
+            "isArchived": [i % 2 == 0 for i in range(rows)],
+            "pushedAt": pd.to_datetime(
+                [f"2024-04-{i % 28 + 1:02d} 01:25:50" for i in range(rows)]
+            ),
+            "mixed": [[1, "one", None][i % 3] for i in range(rows)],
+        }
+    )
+
+
+def assert_round_trip(actual, expected):
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_streamed_table_followed_by_another_table(workbook_path):
+    first, second = get_table(50), get_table(20, offset=100)
+
+    with workbook.workbook_session(workbook_path) as wb:
+        worksheet = wb.active
+        workbook.write_table(worksheet, first, "First", "First table")
+        workbook.write_table(worksheet, second, "Second", "Second table")
+
+        # Most of the first table is streamed in when the workbook is saved
+        assert [len(rows["df"]) for rows in wb.streamed_rows["Sheet"]] == [48, 18]
+
+    tables = workbook.get_table_dfs(workbook_path, "")
+    assert_round_trip(tables["First"], first)
+    assert_round_trip(tables["Second"], second)
+
+    # And the sheet reads back row by row, with the second table after the first
+    sheet = pd.read_excel(workbook_path, header=None)
+    assert sheet.iloc[0, 0] == "First table"
+    assert sheet.iloc[1].tolist() == list(first.columns)
+    assert sheet.iloc[1 + 50 + 2, 0] == "Second table"
+    assert sheet.iloc[1 + 50 + 2 + 21, 0] == "repo <119> & co"
+
+
+def test_table_split_across_part_sheets(workbook_path, monkeypatch):
+    monkeypatch.setattr(workbook, "MAX_SHEET_ROWS", 30)
+    df = get_table(70)
+
+    with workbook.workbook_session(workbook_path) as wb:
+        wb.active.title = "Inventory"
+        workbook.write_table(wb.active, df, "Inventory")
+        assert len(wb.streamed_rows) == 3
+
+    assert openpyxl.load_workbook(workbook_path).sheetnames == [
+        "Inventory",
+        "Inventory (part 2)",
+        "Inventory (part 3)",
+    ]
+
+    assert_round_trip(
+        workbook.get_table_dfs(workbook_path, "Inventory")["Inventory"], df
+    )
+
+    # Blank rows after each part are dropped, the parts' headers are skipped
+    sheet = workbook.get_sheet_df(workbook_path, "Inventory").dropna(how="all")
+    assert sheet["name"].tolist() == df["name"].tolist()